@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Offline benchmarks over recorded menu fixtures.
+
+python -m scraper.benchmark record            # needs network, once
+python -m scraper.benchmark run -o bench.json  # fully offline
+python -m scraper.benchmark compare old.json new.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import platform
+import statistics
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+from scraper.comparator import get_product_changes, get_type_averages
+from scraper.fsutil import PROJECT_DIR
+from scraper.mailer import prepare_email_body
+from scraper.parsers.html_backend import BACKENDS, _available, check_parity
+from scraper.sites import http_client
+from scraper.sites.fingerprint import fingerprint
+from scraper.sites.site_fetcher import _fetch_api_payload
+from scraper.sites.sites import SITES
+from scraper.storage.sheet_constants import COL_DESCRIPTION, COL_NAME, COL_PRICE
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_DIR = os.getenv(
+    "BENCH_FIXTURES_DIR", os.path.join(PROJECT_DIR, "benchmarks", "fixtures")
+)
+MANIFEST = "manifest.json"
+
+
+def _site_meta(site: Dict[str, Any], **overrides) -> Dict[str, Any]:
+    meta = {
+        "restaurant": site["restaurant"],
+        "product_type": site["product_type"],
+        "html_backend": site.get("html_backend"),
+        "scope": site.get("scope"),
+    }
+    meta.update(overrides)
+    return meta
+
+
+def _is_api_site(site: Dict[str, Any]) -> bool:
+    return bool(site.get("needs_playwright") or site.get("json_url"))
+
+
+def record(fixtures_dir: str = FIXTURES_DIR) -> None:
+    """Download the raw payload of every site in SITES into the fixture corpus."""
+
+    os.makedirs(fixtures_dir, exist_ok=True)
+    manifest: Dict[str, Any] = {}
+
+    for site in SITES:
+        if _is_api_site(site):
+            payload, _ = _fetch_api_payload(site)
+            filename = f"{site['id']}.json"
+        else:
+            response = http_client.get(site["url"])
+            response.raise_for_status()
+            payload = response.text
+            filename = f"{site['id']}.html"
+
+        with open(os.path.join(fixtures_dir, filename), "w", encoding="utf-8") as f:
+            f.write(payload)
+
+        manifest[site["id"]] = {
+            "file": filename,
+            "url": site["url"],
+            "bytes": len(payload.encode("utf-8")),
+            "sha256": hashlib.sha256(payload.encode("utf-8")).hexdigest(),
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+        }
+        logger.info("Recorded %s (%d bytes)", site["id"], manifest[site["id"]]["bytes"])
+
+    with open(os.path.join(fixtures_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _load_fixture(fixtures_dir: str, entry: Dict[str, Any]) -> str:
+    with open(os.path.join(fixtures_dir, entry["file"]), encoding="utf-8") as f:
+        return f.read()
+
+
+def _measure(fn: Callable[[], Any], warmup: int, repeat: int) -> Dict[str, Any]:
+    """Time fn after warmup runs, then take one extra run under tracemalloc."""
+
+    for _ in range(warmup):
+        fn()
+
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "repeat": repeat,
+        "mean_ms": round(statistics.mean(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "stdev_ms": round(statistics.stdev(timings), 3) if repeat > 1 else 0.0,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def _previous_inventory(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """A deterministic 'yesterday' for the comparator: some prices and
+    descriptions differ, some products are missing and some were deleted.
+    Values are strings, as they come back from Google Sheets."""
+
+    rng = random.Random(42)
+    previous: List[Dict[str, Any]] = []
+
+    for rec in records:
+        roll = rng.random()
+        if roll < 0.05:
+            continue  # shows up as a new product
+        old = {k: str(v) for k, v in rec.items()}
+        if roll < 0.15:
+            old[COL_PRICE] = str(int(rec[COL_PRICE]) - 100)
+        elif roll < 0.20:
+            old[COL_DESCRIPTION] = rec[COL_DESCRIPTION] + " (régi)"
+        previous.append(old)
+
+    for rec in records[:: max(1, len(records) // 5)]:
+        gone = {k: str(v) for k, v in rec.items()}
+        gone[COL_NAME] = rec[COL_NAME] + " Classic"
+        previous.append(gone)
+
+    return previous
+
+
+def run(fixtures_dir: str = FIXTURES_DIR, warmup: int = 2, repeat: int = 10) -> Dict:
+    """Benchmark replay, parsers and the downstream pipeline; never touches the network."""
+
+    with open(os.path.join(fixtures_dir, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    results: Dict[str, Any] = {}
+    parity: Dict[str, Any] = {}
+    site_records: List[Dict[str, Any]] = []
+
+    for site in SITES:
+        entry = manifest.get(site["id"])
+        if entry is None:
+            logger.warning("No fixture for %s, skipping", site["id"])
+            continue
+
+        payload = _load_fixture(fixtures_dir, entry)
+        meta = _site_meta(site)
+
+        # Replay: what the fetch stage does before handing the body to the parser
+        results[f"replay/{site['id']}"] = _measure(
+            lambda: fingerprint(
+                _load_fixture(fixtures_dir, entry), site.get("volatile_patterns")
+            ),
+            warmup,
+            repeat,
+        )
+
+        results[f"parse/{site['id']}"] = _measure(
+            lambda: site["parser"](payload, meta), warmup, repeat
+        )
+
+        if not _is_api_site(site):
+            for backend in BACKENDS:
+                # make_soup falls back to html.parser, which would be timed
+                # under the missing backend's name
+                if not _available(backend):
+                    continue
+                backend_meta = _site_meta(site, html_backend=backend)
+                results[f"parse/{site['id']}/{backend}"] = _measure(
+                    lambda: site["parser"](payload, backend_meta), warmup, repeat
+                )
+            differences = check_parity(site["parser"], payload, meta)
+            parity[site["id"]] = {b: len(d) for b, d in differences.items()}
+
+        site_records.extend(site["parser"](payload, meta))
+
+    sheet_records = _previous_inventory(site_records)
+    diff_records = get_product_changes(site_records, sheet_records)
+
+    results["get_product_changes"] = _measure(
+        lambda: get_product_changes(site_records, sheet_records), warmup, repeat
+    )
+    results["get_type_averages"] = _measure(
+        lambda: get_type_averages(site_records), warmup, repeat
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "diff.html")
+        results["prepare_email_body"] = _measure(
+            lambda: prepare_email_body(diff_records, output_file=out), warmup, repeat
+        )
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "warmup": warmup,
+            "repeat": repeat,
+            "fixtures": {k: v["sha256"] for k, v in manifest.items()},
+            "backends": [b for b in BACKENDS if _available(b)],
+        },
+        "counts": {
+            "site_records": len(site_records),
+            "sheet_records": len(sheet_records),
+            "diff_records": len(diff_records),
+        },
+        "results": results,
+        "parity": parity,
+    }
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """Median time and peak memory ratios (new / old) for shared benchmarks."""
+
+    lines = []
+    for name, new_result in new["results"].items():
+        old_result = old["results"].get(name)
+        if not old_result:
+            continue
+        t = (
+            new_result["median_ms"] / old_result["median_ms"]
+            if old_result["median_ms"]
+            else 0
+        )
+        m = (
+            new_result["peak_kib"] / old_result["peak_kib"]
+            if old_result["peak_kib"]
+            else 0
+        )
+        lines.append(f"{name:45} time x{t:5.2f}  peak x{m:5.2f}")
+    return lines
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="record fixtures from the live sites")
+    rec.add_argument("--fixtures", default=FIXTURES_DIR)
+
+    bench = sub.add_parser("run", help="run the offline benchmarks")
+    bench.add_argument("--fixtures", default=FIXTURES_DIR)
+    bench.add_argument("--warmup", type=int, default=2)
+    bench.add_argument("--repeat", type=int, default=10)
+    bench.add_argument("-o", "--output", help="write the JSON report here")
+
+    cmp_ = sub.add_parser("compare", help="compare two JSON reports")
+    cmp_.add_argument("old")
+    cmp_.add_argument("new")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record(args.fixtures)
+    elif args.command == "run":
+        report = json.dumps(run(args.fixtures, args.warmup, args.repeat), indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(report)
+        else:
+            print(report)
+    else:
+        with open(args.old, encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        print("\n".join(compare(old, new)))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    main()
@@ -1,92 +1,216 @@
 import logging
 from datetime import date
-from typing import Any, Dict, List, Optional, Tuple
-from collections import defaultdict
-from statistics import mean
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from operator import itemgetter
+from scraper.identity import match_renames
+from scraper.records import ProductRecord
+from scraper.stats import PriceStats
 from scraper.storage.sheet_constants import *
 
 logger = logging.getLogger(__name__)
 
+# Identity of a product across runs
+_product_key = itemgetter(COL_RESTAURANT, COL_TYPE, COL_NAME)
+
+
+def _key_of(rec: Dict[str, Any]) -> Tuple[str, str, str]:
+    """Precomputed key of a ProductRecord; built for a plain dict record."""
+
+    if type(rec) is ProductRecord:
+        return rec.key
+    return _product_key(rec)
+
+
+def _unchanged(site_r: Dict[str, Any], sheet_r: Dict[str, Any]) -> bool:
+    """Identical raw values, which cannot differ after normalisation."""
+
+    if type(site_r) is ProductRecord and type(sheet_r) is ProductRecord:
+        return (
+            site_r.price == sheet_r.price and site_r.description == sheet_r.description
+        )
+    return (
+        site_r["Price"] == sheet_r["Price"]
+        and site_r["Description"] == sheet_r["Description"]
+    )
+
 
 def get_product_changes(
     site_records: List[Dict[str, Any]],
     sheet_records: List[Dict[str, Any]],
 ) -> List[Dict[str, Optional[Any]]]:
-    """Compare two inventories (site vs sheet) and return a list of change-rows"""
+    """Compare two inventories (site vs sheet) and return a list of change-rows
 
-    today = date.today().isoformat()
+    The int()/strip() normalisation and the change dicts are only paid for
+    products whose raw values differ, which on a daily run is a handful.
 
-    def key(rec: Dict[str, Any]) -> Tuple[str, str, str]:
-        return (rec["Restaurant"], rec["Type"], rec["Name"])
+    A new product that is a deleted one under a slightly different name
+    (see identity.match_renames) is reported as a single renamed row,
+    whose COL_OLD_NAME holds the name it had before.
+    """
 
-    site_map = {key(r): r for r in site_records}
-    sheet_map = {key(r): r for r in sheet_records}
-    changes: List[Dict[str, Optional[Any]]] = []
+    differ = ProductDiffer(sheet_records)
+    differ.add(site_records)
+    return differ.changes()
 
-    # 1) New products & updates
-    for k, site_r in site_map.items():
-        if k not in sheet_map:
-            changes.append(
-                {
-                    COL_DATE: today,
-                    COL_RESTAURANT: k[0],
-                    COL_TYPE: k[1],
-                    COL_NAME: k[2],
-                    COL_OLD_PRICE: None,
-                    COL_NEW_PRICE: site_r["Price"],
-                    COL_OLD_DESCRIPTION: None,
-                    COL_NEW_DESCRIPTION: site_r["Description"],
-                    COL_COMMENT: "New Product",
-                }
-            )
-        else:
-            sheet_r = sheet_map[k]
 
-            old_p = int(sheet_r["Price"])
-            new_p = int(site_r["Price"])
+class ProductDiffer:
+    """get_product_changes fed one batch of site records at a time.
 
-            old_d = sheet_r["Description"].strip()
-            new_d = site_r["Description"].strip()
+    Batches (typically one site each, in whatever order the fetches
+    complete) are compared as they arrive, so the site records need not
+    be kept; only the previous inventory, the keys seen and the pending
+    change rows are. changes() returns the same rows, in the same order,
+    as get_product_changes over the batches in batch-number order.
+    """
 
-            price_changed = old_p != new_p
-            desc_changed = old_d != new_d
+    def __init__(self, sheet_records: Iterable[Dict[str, Any]]) -> None:
+        self._today = date.today().isoformat()
+        self._sheet_map = {_key_of(r): r for r in sheet_records}
+        # Key -> (batch, position) of its first occurrence, and of its last
+        # one for the few keys that repeat
+        self._seen: Dict[Tuple[str, str, str], Tuple[int, int]] = {}
+        self._last: Dict[Tuple[str, str, str], Tuple[int, int]] = {}
+        self._rows: Dict[Tuple[str, str, str], Dict[str, Optional[Any]]] = {}
+        # Site record of every key currently reported as a new product
+        self._new: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
 
-            if price_changed or desc_changed:
-                row = {
-                    COL_DATE: today,
-                    COL_RESTAURANT: k[0],
-                    COL_TYPE: k[1],
-                    COL_NAME: k[2],
-                    COL_COMMENT: "",
-                }
-                # Fill price columns only if price changed
-                if price_changed:
-                    row[COL_OLD_PRICE] = old_p
-                    row[COL_NEW_PRICE] = new_p
-                else:
-                    row[COL_OLD_PRICE] = None
-                    row[COL_NEW_PRICE] = None
-                # Fill description columns only if description changed
-                if desc_changed:
-                    row[COL_OLD_DESCRIPTION] = old_d
-                    row[COL_NEW_DESCRIPTION] = new_d
-                else:
-                    row[COL_OLD_DESCRIPTION] = None
-                    row[COL_NEW_DESCRIPTION] = None
-
-                # Build comment
-                parts = []
-                if price_changed:
-                    parts.append("Price")
-                if desc_changed:
-                    parts.append("Description")
-                row[COL_COMMENT] = " & ".join(parts) + " Changed"
-
-                changes.append(row)
-
-    # 2) Deleted products
-    for k, sheet_r in sheet_map.items():
-        if k not in site_map:
+    def add(self, site_records: Iterable[Dict[str, Any]], batch: int = 0) -> None:
+        """Compare one batch; a repeated key keeps its first position and
+        its last record."""
+
+        seen = self._seen
+        sheet_map = self._sheet_map
+        for position, site_r in enumerate(site_records):
+            k = _key_of(site_r)
+            first = seen.get(k)
+            if first is None:
+                seen[k] = (batch, position)
+            else:
+                at = (batch, position)
+                last = self._last.get(k, first)
+                if at < first:
+                    # seen[k] stops being the position of the record held,
+                    # so that one is remembered as the last
+                    seen[k] = at
+                    self._last[k] = last
+                # Batches may arrive out of order: an earlier record of a
+                # repeated key must not replace a later one
+                if at < last:
+                    continue
+                self._last[k] = at
+
+            sheet_r = sheet_map.get(k)
+
+            if sheet_r is not None and _unchanged(site_r, sheet_r):
+                if first is not None:
+                    self._rows.pop(k, None)
+                    self._new.pop(k, None)
+                continue
+
+            row = self._change_row(k, site_r, sheet_r)
+            if row is None:
+                self._rows.pop(k, None)
+            else:
+                self._rows[k] = row
+
+            if row is not None and row[COL_COMMENT] == "New Product":
+                self._new[k] = site_r
+            else:
+                self._new.pop(k, None)
+
+    def _change_row(
+        self,
+        k: Tuple[str, str, str],
+        site_r: Dict[str, Any],
+        sheet_r: Optional[Dict[str, Any]],
+    ) -> Optional[Dict[str, Optional[Any]]]:
+        today = self._today
+
+        # 1) New products & updates
+        if sheet_r is None:
+            return {
+                COL_DATE: today,
+                COL_RESTAURANT: k[0],
+                COL_TYPE: k[1],
+                COL_NAME: k[2],
+                COL_OLD_PRICE: None,
+                COL_NEW_PRICE: site_r["Price"],
+                COL_OLD_DESCRIPTION: None,
+                COL_NEW_DESCRIPTION: site_r["Description"],
+                COL_COMMENT: "New Product",
+            }
+
+        old_p = int(sheet_r["Price"])
+        new_p = int(site_r["Price"])
+
+        old_d = sheet_r["Description"].strip()
+        new_d = site_r["Description"].strip()
+
+        price_changed = old_p != new_p
+        desc_changed = old_d != new_d
+
+        if price_changed or desc_changed:
+            row = {
+                COL_DATE: today,
+                COL_RESTAURANT: k[0],
+                COL_TYPE: k[1],
+                COL_NAME: k[2],
+                COL_COMMENT: "",
+            }
+            # Fill price columns only if price changed
+            if price_changed:
+                row[COL_OLD_PRICE] = old_p
+                row[COL_NEW_PRICE] = new_p
+            else:
+                row[COL_OLD_PRICE] = None
+                row[COL_NEW_PRICE] = None
+            # Fill description columns only if description changed
+            if desc_changed:
+                row[COL_OLD_DESCRIPTION] = old_d
+                row[COL_NEW_DESCRIPTION] = new_d
+            else:
+                row[COL_OLD_DESCRIPTION] = None
+                row[COL_NEW_DESCRIPTION] = None
+
+            # Build comment
+            parts = []
+            if price_changed:
+                parts.append("Price")
+            if desc_changed:
+                parts.append("Description")
+            row[COL_COMMENT] = " & ".join(parts) + " Changed"
+
+            return row
+
+        return None
+
+    def changes(self) -> List[Dict[str, Optional[Any]]]:
+        """Resolve renames and deletions and return every change row."""
+
+        today = self._today
+        sheet_map = self._sheet_map
+        seen = self._seen
+
+        ordered = sorted(self._rows, key=seen.__getitem__)
+        changes = [self._rows[k] for k in ordered]
+        new_positions = [i for i, k in enumerate(ordered) if k in self._new]
+
+        # 2) Renamed products: a new and a deleted row that are the same item
+        deleted_keys = [k for k in sheet_map if k not in seen]
+        new_keys = [ordered[pos] for pos in new_positions]
+        renames = match_renames(new_keys, deleted_keys)
+
+        for i, j in renames.items():
+            site_r = self._new[new_keys[i]]
+            sheet_r = sheet_map[deleted_keys[j]]
+            changes[new_positions[i]] = _renamed_row(today, site_r, sheet_r)
+
+        # 3) Deleted products
+        renamed_from = set(renames.values())
+        for j, k in enumerate(deleted_keys):
+            if j in renamed_from:
+                continue
+            sheet_r = sheet_map[k]
             changes.append(
                 {
                     COL_DATE: today,
@@ -101,38 +225,138 @@ def get_product_changes(
                 }
             )
 
-    return changes
+        return changes
+
+
+def _renamed_row(
+    today: str, site_r: Dict[str, Any], sheet_r: Dict[str, Any]
+) -> Dict[str, Optional[Any]]:
+    """Change row for a product that now goes by site_r's name."""
+
+    old_p = int(sheet_r["Price"])
+    new_p = int(site_r["Price"])
+    old_d = sheet_r["Description"].strip()
+    new_d = site_r["Description"].strip()
+
+    comment = f"Renamed from '{sheet_r['Name']}'"
+    parts = []
+    if old_p != new_p:
+        parts.append("Price")
+    if old_d != new_d:
+        parts.append("Description")
+    if parts:
+        comment += " & " + " & ".join(parts) + " Changed"
+
+    return {
+        COL_DATE: today,
+        COL_RESTAURANT: site_r["Restaurant"],
+        COL_TYPE: site_r["Type"],
+        COL_NAME: site_r["Name"],
+        COL_OLD_NAME: sheet_r["Name"],
+        COL_OLD_PRICE: old_p if old_p != new_p else None,
+        COL_NEW_PRICE: new_p if old_p != new_p else None,
+        COL_OLD_DESCRIPTION: old_d if old_d != new_d else None,
+        COL_NEW_DESCRIPTION: new_d if old_d != new_d else None,
+        COL_COMMENT: comment,
+    }
 
 
 def get_type_averages(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Calculate average, min, and max prices per (restaurant, type), with pizzas listed before pastas."""
 
-    buckets: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    averages = TypeAverages()
+    averages.add(records)
+    return averages.rows()
 
-    for rec in records:
-        key = (rec[COL_RESTAURANT], rec[COL_TYPE])
-        buckets[key].append(rec[COL_PRICE])
 
-    summary: List[Dict[str, Any]] = []
+class TypeAverages:
+    """get_type_averages accumulated batch by batch.
 
-    def sort_key(item: Tuple[str, str]):
-        restaurant, type_ = item
-        return (0 if type_ == "pizza" else 1, restaurant, type_)
+    Each (restaurant, type) bucket is a mergeable PriceStats, so partials
+    built separately (one per site, say) can be merged, and yesterday's
+    stats can be brought up to date from the change rows alone. The run
+    itself rebuilds every bucket with add(), which streaming the sites
+    makes cheap; merge() and apply_changes() are for callers working from
+    stored distributions (see snapshots.type_price_stats).
+    """
 
-    for restaurant, product_type in sorted(buckets, key=sort_key):
-        prices = buckets[(restaurant, product_type)]
-        if not prices:
-            continue
+    def __init__(self) -> None:
+        self._buckets: Dict[Tuple[str, str], PriceStats] = {}
 
-        summary.append(
-            {
-                COL_RESTAURANT: restaurant,
-                COL_TYPE: product_type,
-                COL_COUNT: len(prices),
-                COL_AVERAGE: int(mean(prices)),
-                COL_LOWEST: min(prices),
-                COL_HIGHEST: max(prices),
-            }
-        )
+    def _bucket(self, restaurant: str, product_type: str) -> PriceStats:
+        key = (restaurant, product_type)
+        stats = self._buckets.get(key)
+        if stats is None:
+            stats = self._buckets[key] = PriceStats()
+        return stats
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        for rec in records:
+            self._bucket(rec[COL_RESTAURANT], rec[COL_TYPE]).add(rec[COL_PRICE])
+
+    def merge(self, other: "TypeAverages") -> "TypeAverages":
+        """Add other's buckets to these (in place) and return self."""
+
+        for (restaurant, product_type), stats in other._buckets.items():
+            self._bucket(restaurant, product_type).merge(stats)
+        return self
+
+    def apply_changes(self, diff_records: Iterable[Dict[str, Any]]) -> None:
+        """Update from get_product_changes rows instead of the full inventory.
+
+        An old price leaves its bucket and a new price joins it; rows
+        without a price change carry neither and are no-ops.
+        """
+
+        for rec in diff_records:
+            stats = self._bucket(rec[COL_RESTAURANT], rec[COL_TYPE])
+            if rec.get(COL_OLD_PRICE) is not None:
+                stats.remove(int(rec[COL_OLD_PRICE]))
+            if rec.get(COL_NEW_PRICE) is not None:
+                stats.add(int(rec[COL_NEW_PRICE]))
+
+    def rows(self) -> List[Dict[str, Any]]:
+        summary: List[Dict[str, Any]] = []
+
+        def sort_key(item: Tuple[str, str]):
+            restaurant, type_ = item
+            return (0 if type_ == "pizza" else 1, restaurant, type_)
+
+        for restaurant, product_type in sorted(self._buckets, key=sort_key):
+            stats = self._buckets[(restaurant, product_type)]
+            if not stats.count:
+                continue
+
+            summary.append(
+                {
+                    COL_RESTAURANT: restaurant,
+                    COL_TYPE: product_type,
+                    COL_COUNT: stats.count,
+                    COL_AVERAGE: stats.average,
+                    COL_LOWEST: stats.lowest,
+                    COL_HIGHEST: stats.highest,
+                    COL_MEDIAN: stats.quantile(0.5),
+                    COL_P90: stats.quantile(0.9),
+                }
+            )
+
+        return summary
+
+    def to_dict(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """JSON-safe form: restaurant -> type -> price distribution."""
+
+        data: Dict[str, Dict[str, Dict[str, int]]] = {}
+        for (restaurant, product_type), stats in self._buckets.items():
+            if stats.count:
+                data.setdefault(restaurant, {})[product_type] = stats.to_dict()
+        return data
 
-    return summary
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, Dict[str, int]]]) -> "TypeAverages":
+        averages = cls()
+        for restaurant, types in data.items():
+            for product_type, prices in types.items():
+                averages._buckets[(restaurant, product_type)] = PriceStats.from_dict(
+                    prices
+                )
+        return averages
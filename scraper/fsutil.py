@@ -0,0 +1,25 @@
+import os
+import tempfile
+from typing import Union
+
+PROJECT_DIR = os.path.abspath(os.path.join(__file__, os.pardir, os.pardir))
+
+# Default home of the on-disk caches (HTTP responses, history, snapshots)
+CACHE_DIR = os.path.join(PROJECT_DIR, ".cache")
+
+
+def write_atomic(path: str, data: Union[str, bytes]) -> None:
+    """Replace path with data (str is written as UTF-8) via a temporary
+    file in the same directory, so readers never see a partial file."""
+
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
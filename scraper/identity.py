@@ -0,0 +1,124 @@
+import os
+import re
+import logging
+import unicodedata
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Minimum similarity (0-1) of two normalised names to call it a rename;
+# set above 1 to turn rename matching off
+RENAME_THRESHOLD = float(os.getenv("RENAME_MATCH_THRESHOLD", 0.8))
+
+# Trigrams shared by more deleted names than this say nothing about identity
+# ("piz", "zza"), so they are left out of candidate generation
+MAX_POSTING = int(os.getenv("RENAME_MAX_POSTING", 50))
+
+# Only the best-blocked candidates of each new name are scored
+MAX_CANDIDATES = 5
+
+_NON_WORD = re.compile(r"[\W_]+")
+_NUMBER = re.compile(r"\d+")
+
+ProductKey = Tuple[str, str, str]
+
+
+def normalise_name(name: str) -> str:
+    """Case, accent, punctuation and spacing-insensitive form of a name.
+
+    'Margherita  Pizza', 'MARGHERITA pizza' and 'Margheríta-Pizza' all
+    normalise to 'margherita pizza'.
+    """
+
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", stripped.casefold()).strip()
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _match_group(new: List[Tuple[int, str]], deleted: List[Tuple[int, str]]):
+    """Scored (similarity, new index, deleted index) candidates of one
+    (restaurant, type) group."""
+
+    # Identical once normalised: a capitalisation or spacing fix
+    by_norm: Dict[str, List[int]] = defaultdict(list)
+    for j, norm in deleted:
+        by_norm[norm].append(j)
+
+    # Inverted trigram index over the deleted names
+    postings: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+    for j, norm in deleted:
+        for gram in _trigrams(norm):
+            postings[gram].append((j, norm))
+
+    for i, norm in new:
+        exact = by_norm.get(norm)
+        if exact:
+            for j in exact:
+                yield 1.0, i, j
+            continue
+
+        shared: Counter = Counter()
+        for gram in _trigrams(norm):
+            posting = postings.get(gram, ())
+            if len(posting) <= MAX_POSTING:
+                shared.update(posting)
+
+        numbers = _NUMBER.findall(norm)
+        for (j, other), _ in shared.most_common(MAX_CANDIDATES):
+            # 'Pizza 12' and 'Pizza 13' are different products
+            if _NUMBER.findall(other) != numbers:
+                continue
+            score = SequenceMatcher(None, norm, other).ratio()
+            if score >= RENAME_THRESHOLD:
+                yield score, i, j
+
+
+def match_renames(
+    new_keys: Sequence[ProductKey], deleted_keys: Sequence[ProductKey]
+) -> Dict[int, int]:
+    """Pair new products with deleted products that are the same item under
+    a slightly different name.
+
+    Only products of the same restaurant and type are compared, and only
+    through shared name trigrams, so the cost grows with the number of
+    products rather than with every new x deleted pair. Each product is
+    used at most once, best similarity first.
+
+    Returns {index in new_keys: index in deleted_keys}.
+    """
+
+    if not new_keys or not deleted_keys or RENAME_THRESHOLD > 1:
+        return {}
+
+    groups: Dict[Tuple[str, str], Tuple[list, list]] = defaultdict(lambda: ([], []))
+    for i, (restaurant, type_, name) in enumerate(new_keys):
+        groups[(restaurant, type_)][0].append((i, normalise_name(name)))
+    for j, (restaurant, type_, name) in enumerate(deleted_keys):
+        if (restaurant, type_) in groups:
+            groups[(restaurant, type_)][1].append((j, normalise_name(name)))
+
+    candidates: Iterable[Tuple[float, int, int]] = (
+        candidate
+        for new, deleted in groups.values()
+        if deleted
+        for candidate in _match_group(new, deleted)
+    )
+
+    pairs: Dict[int, int] = {}
+    taken: Set[int] = set()
+    for score, i, j in sorted(candidates, key=lambda c: (-c[0], c[1], c[2])):
+        if i in pairs or j in taken:
+            continue
+        pairs[i] = j
+        taken.add(j)
+
+    if pairs:
+        logger.info("Matched %d renamed products", len(pairs))
+    return pairs
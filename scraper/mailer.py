@@ -4,9 +4,11 @@ from email.message import EmailMessage
 from typing import Any, Dict, List
 from datetime import datetime
 
+from scraper import metrics
 from scraper.storage.sheet_constants import DIFFERENCES_HEADER
 
 
+@metrics.timer("mail.send")
 def send_diff_email(
     html_file: str = "diff.html",
     subject: str = "Diff Report",
@@ -38,8 +40,10 @@ def send_diff_email(
     with smtplib.SMTP_SSL(host, port) as smtp:
         smtp.login(user, pwd)
         smtp.send_message(msg)
+    metrics.incr("mail.sent")
 
 
+@metrics.timer("mail.render")
 def prepare_email_body(
     records: List[Dict[str, Any]], output_file: str = "diff.html"
 ) -> None:
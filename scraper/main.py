@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
+import os
 import sys
+import json
 import logging
+import smtplib
 
+from scraper import metrics
 from scraper.mailer import prepare_email_body, send_diff_email
-from scraper.sites.site_fetcher import get_site_records
+from scraper.sinks import Sink, SinkError, publish_all
+from scraper.sites.site_fetcher import get_site_records, iter_site_records
+from scraper.storage import history, snapshots
 from scraper.storage.sheets_reader import get_product_records
 from scraper.comparator import *
 from scraper.storage.sheets_writer import *
@@ -24,6 +30,18 @@ logger = logging.getLogger(__name__)
 
 
 def main():
+    try:
+        with metrics.timer("run.total"):
+            _run()
+    finally:
+        logger.info("Run metrics: %s", json.dumps(metrics.summary()))
+        metrics.write_summary(
+            os.getenv("METRICS_FILE", "run_metrics.json"),
+            os.getenv("METRICS_PROMETHEUS_FILE"),
+        )
+
+
+def _run():
 
     DEBUG = False
 
@@ -33,35 +51,110 @@ def main():
         site_records = get_site_records("test")
         print(site_records)
         return
-    else:
-        site_records = get_site_records()
 
-    # Fetch Google Sheets records
-    sheet_records = get_product_records("A3", "E250", header_row=2)
-
-    # Compare the records and get the differences
-    diff_records = get_product_changes(
-        site_records=site_records,
-        sheet_records=sheet_records,
+    # Previous state comes from the local snapshot store; Google Sheets is
+    # only read to bootstrap it on the very first run
+    sheet_records = snapshots.latest_records()
+    if sheet_records is None:
+        logger.info("No local snapshot yet, reading previous state from Sheets")
+        sheet_records = get_product_records("A3", header_row=2)
+
+    differ = ProductDiffer(sheet_records)
+    averages = TypeAverages()
+    del sheet_records
+
+    price_history = history.HistoryWriter()
+
+    with snapshots.SnapshotWriter() as snapshot:
+        # Each site is compared, aggregated and stored as soon as it is in;
+        # only one site's records are held at a time
+        fetched = 0
+        for index, site, site_records in iter_site_records():
+            differ.add(site_records, batch=index)
+            averages.add(site_records)
+            snapshot.add(site_records)
+            price_history.add(site_records)
+            fetched += len(site_records)
+        logger.info("Total new records fetched: %d", fetched)
+
+        # Compare the records and get the differences
+        diff_records = differ.changes()
+
+        # Too many changes at once usually means a broken parser: keep the
+        # last good state as the reference and only report the differences
+        accept_changes = len(diff_records) <= 5
+
+        if accept_changes:
+            snapshot.add_type_stats(averages.rows(), averages.to_dict())
+
+        # Every output is published at once; a slow SMTP handshake does not
+        # hold up the Sheets update or the other way round
+        average_records = averages.rows()
+        sinks = [
+            # Sheets requests retry themselves; the batch is not safe to repeat
+            Sink(
+                "sheets",
+                lambda: _publish_to_sheets(
+                    average_records, diff_records, accept_changes
+                ),
+            )
+        ]
+        if diff_records:
+            sinks.append(
+                Sink(
+                    "email",
+                    lambda: _send_email(diff_records),
+                    retries=int(os.getenv("SMTP_MAX_RETRIES", 2)),
+                    retry_on=(smtplib.SMTPException, OSError),
+                )
+            )
+
+        try:
+            publish_all(sinks)
+            failed = None
+        except SinkError as e:
+            failed = e
+
+        # The snapshot is the reference the next run's Sheets deltas are
+        # computed from, so it only moves on once Sheets has these changes;
+        # otherwise the next run reports and writes them again
+        if accept_changes and (failed is None or "sheets" not in failed.failures):
+            snapshot.commit()
+            price_history.commit()
+        elif accept_changes:
+            logger.warning("Sheets were not updated, keeping the previous snapshot")
+
+    if failed is not None:
+        raise failed
+
+
+def _send_email(diff_records) -> None:
+    """Mail the run's differences as an HTML report."""
+
+    prepare_email_body(diff_records)
+    send_diff_email(
+        html_file="diff.html",
+        subject="🚨 Diff Report: changes detected",
     )
 
-    if diff_records:
 
-        if len(diff_records) <= 5:
-            bulk_append_products(site_records, "A3", "E250")
-            average_records = get_type_averages(site_records)
-            bulk_replace_averages(average_records, "A5", "D50")
+def _publish_to_sheets(average_records, diff_records, accept_changes: bool) -> None:
+    """Mirror the run's results to Google Sheets."""
 
-        bulk_append_differences(diff_records, "A2")
+    # All Sheets writes of the run go out together when the batch is flushed
+    batch = SheetsWriteBatch()
 
-        prepare_email_body(diff_records)
-        send_diff_email(
-            html_file="diff.html",
-            subject="🚨 Diff Report: changes detected",
-        )
+    if diff_records:
+
+        if accept_changes:
+            apply_product_changes(diff_records, "A3", batch=batch)
+            bulk_replace_averages(average_records, "A5", batch=batch)
+
+        bulk_append_differences(diff_records, "A2", batch=batch)
 
     # Set the execution date in the last run worksheet
-    set_execution_date("A1")
+    set_execution_date("A1", batch=batch)
+    batch.flush()
 
 
 if __name__ == "__main__":
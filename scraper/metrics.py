@@ -0,0 +1,103 @@
+import re
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_timers: Dict[str, Dict[str, float]] = {}
+_counters: Dict[str, float] = {}
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """Time a block; also usable as a decorator (@timer("parse.etna")).
+
+    Repeated and concurrent uses of the same name accumulate.
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            stats = _timers.setdefault(name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            stats["count"] += 1
+            stats["total_s"] += elapsed
+            stats["max_s"] = max(stats["max_s"], elapsed)
+
+
+def incr(name: str, value: float = 1) -> None:
+    """Add value to a counter (bytes fetched, records parsed, API calls...)."""
+
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def reset() -> None:
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def summary() -> Dict[str, Any]:
+    """Snapshot of all timers and counters collected so far."""
+
+    with _lock:
+        return {
+            "timers": {
+                name: {
+                    "count": int(stats["count"]),
+                    "total_s": round(stats["total_s"], 4),
+                    "max_s": round(stats["max_s"], 4),
+                }
+                for name, stats in sorted(_timers.items())
+            },
+            "counters": dict(sorted(_counters.items())),
+        }
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def to_prometheus(prefix: str = "scraper") -> str:
+    """Render the summary in the Prometheus text exposition format."""
+
+    data = summary()
+    lines = [
+        f"# TYPE {prefix}_stage_seconds_total counter",
+        *(
+            f'{prefix}_stage_seconds_total{{stage="{name}"}} {s["total_s"]}'
+            for name, s in data["timers"].items()
+        ),
+        f"# TYPE {prefix}_stage_calls_total counter",
+        *(
+            f'{prefix}_stage_calls_total{{stage="{name}"}} {s["count"]}'
+            for name, s in data["timers"].items()
+        ),
+    ]
+    for name, value in data["counters"].items():
+        metric = f"{prefix}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_summary(json_path: str, prometheus_path: str = None) -> None:
+    """Write the run summary as JSON and, optionally, as Prometheus text."""
+
+    try:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(summary(), f, indent=2)
+        if prometheus_path:
+            with open(prometheus_path, "w", encoding="utf-8") as f:
+                f.write(to_prometheus())
+        logger.info("Wrote run metrics to %s", json_path)
+    except OSError as e:
+        logger.warning("Could not write run metrics: %s", e)
@@ -1,18 +1,14 @@
 import re
 from typing import Any, Dict, List
-from bs4 import BeautifulSoup
-from scraper.storage.sheet_constants import (
-    COL_RESTAURANT,
-    COL_TYPE,
-    COL_NAME,
-    COL_PRICE,
-    COL_DESCRIPTION,
-)
+from scraper import metrics
+from scraper.parsers.html_backend import make_soup
+from scraper.records import ProductRecord
 
 
-def parse(html: str, site_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+@metrics.timer("parser.bellozzo")
+def parse(html: str, site_meta: Dict[str, Any]) -> List[ProductRecord]:
 
-    soup = BeautifulSoup(html, "html.parser")
+    soup = make_soup(html, site_meta)
     items = []
 
     for box in soup.select(".menu-item-box"):
@@ -34,13 +30,13 @@ def parse(html: str, site_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
         price = int(numbers[-1]) if numbers else 0
 
         items.append(
-            {
-                COL_RESTAURANT: site_meta.get("restaurant"),
-                COL_TYPE: site_meta.get("product_type"),
-                COL_NAME: product_name,
-                COL_PRICE: price,
-                COL_DESCRIPTION: description,
-            }
+            ProductRecord(
+                restaurant=site_meta.get("restaurant"),
+                product_type=site_meta.get("product_type"),
+                name=product_name,
+                price=price,
+                description=description,
+            )
         )
 
     return items
@@ -1,17 +1,13 @@
 import re
 from typing import Any, Dict, List
-from bs4 import BeautifulSoup
-from scraper.storage.sheet_constants import (
-    COL_RESTAURANT,
-    COL_TYPE,
-    COL_NAME,
-    COL_PRICE,
-    COL_DESCRIPTION,
-)
-
-
-def parse(html: str, site_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
-    soup = BeautifulSoup(html, "html.parser")
+from scraper import metrics
+from scraper.parsers.html_backend import make_soup
+from scraper.records import ProductRecord
+
+
+@metrics.timer("parser.donnamamma")
+def parse(html: str, site_meta: Dict[str, Any]) -> List[ProductRecord]:
+    soup = make_soup(html, site_meta)
     output = []
 
     stop_section = soup.find(
@@ -48,13 +44,13 @@ def parse(html: str, site_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
                 continue
 
             output.append(
-                {
-                    COL_RESTAURANT: site_meta["restaurant"],
-                    COL_TYPE: site_meta["product_type"],
-                    COL_NAME: name,
-                    COL_PRICE: price,
-                    COL_DESCRIPTION: description,
-                }
+                ProductRecord(
+                    restaurant=site_meta["restaurant"],
+                    product_type=site_meta["product_type"],
+                    name=name,
+                    price=price,
+                    description=description,
+                )
             )
 
     return output
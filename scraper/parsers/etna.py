@@ -1,33 +1,73 @@
 import re
 from typing import Any, Dict, List
-from bs4 import BeautifulSoup
-from scraper.storage.sheet_constants import (
-    COL_RESTAURANT,
-    COL_TYPE,
-    COL_NAME,
-    COL_PRICE,
-    COL_DESCRIPTION,
-)
+from bs4 import Tag
+from scraper import metrics
+from scraper.parsers.html_backend import make_soup
+from scraper.records import ProductRecord
 
+# Compiled once at import; these run for every centered block on the page
+_WHITESPACE = re.compile(r"\s+")
+_DIGITS = re.compile(r"\d+")
 
-def pizzaparse(html: str, site_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+# Pizza: price right before a '.-' suffix, e.g. '2800.-'
+_PIZZA_PRICE = re.compile(r"(\d+)(?=\.-)")
+# Pizza: spans holding any price characters are not names
+_PRICE_CHARS = re.compile(r"[\d\.\-]")
+
+# Pasta: first 3-4 digit number is the price
+_PASTA_PRICE = re.compile(r"(\d{3,4})")
+# Pasta: group headings ('... alapú') and footers are not products
+_PASTA_SKIP = re.compile(r"alapú|©|all rights|web by|design by", re.I)
+# Pasta: a sibling with any of these is a price line or footer, not a description
+_PASTA_DESC_STOP = re.compile(r"\d{3,4}|\.-|GM|(?i:Nem elérhető)")
+_PASTA_SAUCE_LABEL = re.compile(r"^(?:paradicsom alapú|tejszín alapú)\s*:?", re.I)
+_N_MARKER = re.compile(r"\bN\.\s*")
+_TRAILING_N = re.compile(r"\s+N\.?$")
+
+_CRLF_TO_SPACE = str.maketrans({"\r": " ", "\n": " "})
+
+
+def _text_of(node: Tag, cache: Dict[int, str]) -> str:
+    """get_text(" ", strip=True) once per node; headers are also read as siblings."""
+
+    key = id(node)
+    text = cache.get(key)
+    if text is None:
+        text = cache[key] = node.get_text(separator=" ", strip=True)
+    return text
+
+
+def _is_centered_block(tag: Tag) -> bool:
+    return tag.name in ("p", "div") and tag.get("align") == "center"
+
+
+def _clean_description(text: str) -> str:
+    """Drop a leading sauce label and collapse whitespace."""
+
+    text = _PASTA_SAUCE_LABEL.sub("", text.translate(_CRLF_TO_SPACE))
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+@metrics.timer("parser.etna_pizza")
+def pizzaparse(html: str, site_meta: Dict[str, Any]) -> List[ProductRecord]:
     """
     Parse the Pizza menu HTML into a list of product records.
     Cleans whitespace, skips duplicates, and extracts price, name, description.
     Handles split price components (e.g., '28' and '00.-' => 2800).
     Ensures the primary (non-GM) price is selected correctly.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    items: List[Dict[str, Any]] = []
+    soup = make_soup(html, site_meta)
+    items: List[ProductRecord] = []
     seen_names = set()
+    texts: Dict[int, str] = {}
 
     for header in soup.select('p.MsoNormal[align="center"], div[align="center"]'):
-        header_text = header.get_text(separator=" ", strip=True)
+        header_text = _text_of(header, texts)
         gm_pos = header_text.find("GM")
 
         # Attempt to extract primary price (exclude any after 'GM')
         price = None
-        for match in re.finditer(r"(\d+)(?=\.-)", header_text):
+        for match in _PIZZA_PRICE.finditer(header_text):
             val = int(match.group(1))
             if val <= 0:
                 continue
@@ -39,8 +79,8 @@ def pizzaparse(html: str, site_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
 
         # Fallback: combine split price parts before any 'GM' marker
         if price is None:
-            part = header_text.split("GM")[0]
-            nums = re.findall(r"\d+", part)
+            part = header_text if gm_pos == -1 else header_text[:gm_pos]
+            nums = _DIGITS.findall(part)
             if len(nums) >= 2:
                 high, low = nums[-2], nums[-1]
                 factor = 10 ** len(low)
@@ -57,54 +97,53 @@ def pizzaparse(html: str, site_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
         else:
             for span in header.find_all("span"):
                 txt = span.get_text(strip=True)
-                if txt and not re.search(r"[\d\.\-]", txt):
+                if txt and not _PRICE_CHARS.search(txt):
                     name = txt
                     break
-        name = re.sub(r"\s+", " ", name or "N/A").strip()
+        name = _WHITESPACE.sub(" ", name or "N/A").strip()
         if name in seen_names:
             continue
         seen_names.add(name)
 
         # Find next sibling for description
-        desc_tag = header.find_next_sibling(
-            lambda tag: tag.name in ("p", "div") and tag.get("align") == "center"
-        )
+        desc_tag = header.find_next_sibling(_is_centered_block)
         description = ""
         if desc_tag:
-            desc_raw = desc_tag.get_text(separator=" ", strip=True)
-            description = re.sub(r"\s+", " ", desc_raw).strip()
+            description = _WHITESPACE.sub(" ", _text_of(desc_tag, texts)).strip()
 
         items.append(
-            {
-                COL_RESTAURANT: site_meta.get("restaurant"),
-                COL_TYPE: site_meta.get("product_type"),
-                COL_NAME: name,
-                COL_PRICE: price,
-                COL_DESCRIPTION: description,
-            }
+            ProductRecord(
+                restaurant=site_meta.get("restaurant"),
+                product_type=site_meta.get("product_type"),
+                name=name,
+                price=price,
+                description=description,
+            )
         )
 
     return items
 
 
-def pastaparse(html: str, site_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+@metrics.timer("parser.etna_pasta")
+def pastaparse(html: str, site_meta: Dict[str, Any]) -> List[ProductRecord]:
     """Parse the Pasta menu HTML into a list of pasta product records."""
-    soup = BeautifulSoup(html, "html.parser")
-    items: List[Dict[str, Any]] = []
+    soup = make_soup(html, site_meta)
+    items: List[ProductRecord] = []
     seen_names = set()
+    texts: Dict[int, str] = {}
 
     # Iterate over centered paragraphs/divs that contain prices
-    for header in soup.find_all(['p', 'div'], attrs={'align': 'center'}):
-        header_text = header.get_text(separator=" ", strip=True)
+    for header in soup.find_all(["p", "div"], attrs={"align": "center"}):
+        header_text = _text_of(header, texts)
 
         # Skip group headings and footers
-        if re.search(r'alapú', header_text, re.I) or re.search(r"©|all rights|web by|design by", header_text, re.I):
+        if _PASTA_SKIP.search(header_text):
             continue
 
         # Locate first price before any 'GM' marker
-        gm_pos = header_text.find('GM')
+        gm_pos = header_text.find("GM")
         price_match = None
-        for m in re.finditer(r"(\d{3,4})", header_text):
+        for m in _PASTA_PRICE.finditer(header_text):
             if gm_pos != -1 and m.start() > gm_pos:
                 continue
             price_match = m
@@ -114,46 +153,37 @@ def pastaparse(html: str, site_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
         price = int(price_match.group(1))
 
         # Extract name
-        name_part = header_text[:price_match.start()].strip()
-        name_part = re.sub(r'\bN\.\s*', '', name_part)
-        name_part = re.sub(r'\s+N\.?$', '', name_part).strip()
-        name = re.sub(r"\s+", " ", name_part)
+        name_part = header_text[: price_match.start()].strip()
+        name_part = _N_MARKER.sub("", name_part)
+        name_part = _TRAILING_N.sub("", name_part).strip()
+        name = _WHITESPACE.sub(" ", name_part)
         if not name or name in seen_names:
             continue
         seen_names.add(name)
 
-        # Description via sibling tag
-        description = ''
+        # Description via the next centered sibling, unless it is a price line or footer
+        description = ""
         sib = header.find_next_sibling()
         while sib:
-            if getattr(sib, 'get', None) and sib.get('align') == 'center':
-                txt = sib.get_text(separator=' ', strip=True)
-                # Normalize any residual line breaks
-                txt = txt.replace('\r', ' ').replace('\n', ' ')
-                # Skip footers or price markers
-                if re.search(r"\d{3,4}", txt) or re.search(r"\.-", txt) or re.search(r"GM", txt) or re.search(r"Nem elérhető", txt, re.I):
-                    break
-                # Remove sauce label and collapse whitespace
-                desc = re.sub(r'^(?:paradicsom alapú|tejszín alapú)\s*:?', '', txt, flags=re.I)
-                desc = re.sub(r"\s+", " ", desc).strip()
-                description = desc
+            if getattr(sib, "get", None) and sib.get("align") == "center":
+                txt = _text_of(sib, texts).translate(_CRLF_TO_SPACE)
+                if not _PASTA_DESC_STOP.search(txt):
+                    description = _clean_description(txt)
                 break
             sib = sib.find_next_sibling()
 
         # Inline fallback if no sibling description
         if not description:
-            post_price = header_text[price_match.end():]
-            post_price = post_price.replace('\r', ' ').replace('\n', ' ')
-            inline_desc = re.sub(r'^(?:paradicsom alapú|tejszín alapú)\s*:?', '', post_price, flags=re.I)
-            inline_desc = re.sub(r"\s+", " ", inline_desc).strip()
-            description = inline_desc
-
-        items.append({
-            COL_RESTAURANT: site_meta.get('restaurant'),
-            COL_TYPE: site_meta.get('product_type'),
-            COL_NAME: name,
-            COL_PRICE: price,
-            COL_DESCRIPTION: description,
-        })
-
-    return items
\ No newline at end of file
+            description = _clean_description(header_text[price_match.end() :])
+
+        items.append(
+            ProductRecord(
+                restaurant=site_meta.get("restaurant"),
+                product_type=site_meta.get("product_type"),
+                name=name,
+                price=price,
+                description=description,
+            )
+        )
+
+    return items
@@ -0,0 +1,74 @@
+import os
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+
+logger = logging.getLogger(__name__)
+
+# Tree builders BeautifulSoup can run on; lxml is the fast C parser
+BACKENDS = ("html.parser", "lxml", "html5lib")
+
+DEFAULT_BACKEND = os.getenv("HTML_PARSER_BACKEND", "html.parser")
+
+
+@lru_cache(maxsize=None)
+def _available(backend: str) -> bool:
+    try:
+        BeautifulSoup("", backend)
+        return True
+    except FeatureNotFound:
+        return False
+
+
+def backend_for(site_meta: Dict[str, Any]) -> str:
+    """Backend for this site: site_meta["html_backend"], else HTML_PARSER_BACKEND."""
+
+    backend = site_meta.get("html_backend") or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {backend!r}")
+    if not _available(backend):
+        logger.warning("HTML backend %r not installed, using html.parser", backend)
+        return "html.parser"
+    return backend
+
+
+def make_soup(html: str, site_meta: Dict[str, Any]) -> BeautifulSoup:
+    """Build the soup for a parser with the configured backend.
+
+    When the site declares a scope (SoupStrainer arguments, e.g.
+    {"name": "section"}), only matching elements and their subtrees are
+    built; headers, footers, scripts and inline CSS are never allocated.
+    """
+
+    backend = backend_for(site_meta)
+    scope = site_meta.get("scope")
+
+    # html5lib always builds the full tree and ignores parse_only
+    if not scope or backend == "html5lib":
+        return BeautifulSoup(html, backend)
+
+    return BeautifulSoup(html, backend, parse_only=SoupStrainer(**scope))
+
+
+def check_parity(
+    parser: Callable[[str, Dict[str, Any]], Iterable[Dict[str, Any]]],
+    html: str,
+    site_meta: Dict[str, Any],
+    backends: Iterable[str] = BACKENDS,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Run a parser on every installed backend and return the records each one
+    produced that differ from html.parser's output (empty lists mean parity)."""
+
+    reference = list(parser(html, {**site_meta, "html_backend": "html.parser"}))
+    differences: Dict[str, List[Dict[str, Any]]] = {}
+
+    for backend in backends:
+        if backend == "html.parser" or not _available(backend):
+            continue
+        records = list(parser(html, {**site_meta, "html_backend": backend}))
+        differences[backend] = [rec for rec in records if rec not in reference] + [
+            rec for rec in reference if rec not in records
+        ]
+
+    return differences
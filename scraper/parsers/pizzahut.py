@@ -1,61 +1,41 @@
-import asyncio
 import json
 from typing import Dict, List
-from playwright.async_api import async_playwright
 import logging
+from scraper import metrics
+from scraper.records import ProductRecord
 
 logger = logging.getLogger(__name__)
 
+# Response the browser capture waits for (see SITES)
+MENU_RESPONSE_PATTERN = "/menu/TAKEAWAY/"
 
-async def _fetch_pizzahut_json(url: str) -> Dict:
 
-    async with async_playwright() as p:
-        browser = await p.firefox.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
+def is_menu_payload(text: str) -> bool:
+    """True if a captured response body is the JSON document holding the menu."""
 
-        result = {}
+    if not text.strip().startswith("{"):
+        return False
+    try:
+        return "menu" in json.loads(text)
+    except ValueError:
+        return False
 
-        async def handle_response(response):
 
-            DEBUG = False
+@metrics.timer("parser.pizzahut")
+def parse(html: str, metadata: Dict[str, str]) -> List[ProductRecord]:
+    """Parse the captured /menu/TAKEAWAY/ JSON body into product records."""
 
-            try:
-                if "/menu/TAKEAWAY/" in response.url and response.status == 200:
-                    text = await response.text()
-                    if not text.strip().startswith("{"):
-                        return
-                    full_json = json.loads(text)
+    DEBUG = False
 
-                    if DEBUG:  # Save JSON to file
-                        with open("pizzahut_raw.json", "w", encoding="utf-8") as f:
-                            json.dump(full_json, f, ensure_ascii=False, indent=2)
+    full_json = json.loads(html)
 
-                    if "menu" in full_json:
-                        result.update(full_json["menu"])
-            except Exception as e:
-                logger.warning("Error in response handler: %s", e)
+    if DEBUG:  # Save JSON to file
+        with open("pizzahut_raw.json", "w", encoding="utf-8") as f:
+            json.dump(full_json, f, ensure_ascii=False, indent=2)
 
-        page.on("response", handle_response)
-
-        await page.goto(url, wait_until="networkidle")
-
-        await page.wait_for_timeout(5000)
-        await browser.close()
-
-        if not result:
-            raise RuntimeError("No menu data found")
-
-        return result
-
-
-def fetch_menu_data(url: str) -> Dict:
-    return asyncio.run(_fetch_pizzahut_json(url))
-
-
-def parse(html: str, metadata: Dict[str, str]) -> List[Dict[str, any]]:
-
-    data = fetch_menu_data(html)
+    data = full_json.get("menu")
+    if not data:
+        raise RuntimeError("No menu data found")
 
     records = []
     for category in data.get("categories", []):
@@ -76,13 +56,13 @@ def parse(html: str, metadata: Dict[str, str]) -> List[Dict[str, any]]:
             if price < 2000:
                 continue
 
-            record = {
-                "Restaurant": metadata["restaurant"],
-                "Type": product_type,
-                "Name": item.get("name", "").title().strip(),
-                "Price": price,
-                "Description": item.get("description", "").strip(),
-            }
+            record = ProductRecord(
+                restaurant=metadata["restaurant"],
+                product_type=product_type,
+                name=item.get("name", "").title().strip(),
+                price=price,
+                description=item.get("description", "").strip(),
+            )
             records.append(record)
 
     return records
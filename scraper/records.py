@@ -0,0 +1,116 @@
+import sys
+from typing import Any, Dict, Iterator, List, Tuple
+from scraper.storage.sheet_constants import (
+    COL_RESTAURANT,
+    COL_TYPE,
+    COL_NAME,
+    COL_PRICE,
+    COL_DESCRIPTION,
+)
+
+# Column name -> attribute, in PIZZA_HEADER / PASTA_HEADER order
+_FIELDS = {
+    COL_RESTAURANT: "restaurant",
+    COL_TYPE: "product_type",
+    COL_NAME: "name",
+    COL_PRICE: "price",
+    COL_DESCRIPTION: "description",
+}
+
+
+class ProductRecord:
+    """One product as parsed from a site.
+
+    A slotted object instead of a five-key dict: restaurant and type are
+    interned (every record of a site shares the same two strings) and the
+    (restaurant, type, name) identity is computed once, here, instead of
+    on every comparison. Treat it as read-only.
+
+    It still reads like the dicts it replaces: rec[COL_PRICE],
+    rec.get(COL_DESCRIPTION, ""), dict(rec) and == against a dict all
+    work, so code written for dict records keeps working.
+    """
+
+    __slots__ = ("key", "price", "description")
+
+    def __init__(
+        self,
+        restaurant: str,
+        product_type: str,
+        name: str,
+        price: Any,
+        description: str,
+    ) -> None:
+        # The identity tuple doubles as the storage of its three fields
+        self.key: Tuple[str, str, str] = (
+            sys.intern(restaurant),
+            sys.intern(product_type),
+            name,
+        )
+        self.price = price
+        self.description = description
+
+    @property
+    def restaurant(self) -> str:
+        return self.key[0]
+
+    @property
+    def product_type(self) -> str:
+        return self.key[1]
+
+    @property
+    def name(self) -> str:
+        return self.key[2]
+
+    @classmethod
+    def from_dict(cls, rec: Dict[str, Any]) -> "ProductRecord":
+        return cls(
+            rec[COL_RESTAURANT],
+            rec[COL_TYPE],
+            rec[COL_NAME],
+            rec[COL_PRICE],
+            rec[COL_DESCRIPTION],
+        )
+
+    def __getitem__(self, column: str) -> Any:
+        try:
+            return getattr(self, _FIELDS[column])
+        except KeyError:
+            raise KeyError(column) from None
+
+    def get(self, column: str, default: Any = None) -> Any:
+        attr = _FIELDS.get(column)
+        return default if attr is None else getattr(self, attr)
+
+    def __contains__(self, column: object) -> bool:
+        return column in _FIELDS
+
+    def keys(self) -> List[str]:
+        return list(_FIELDS)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((column, getattr(self, attr)) for column, attr in _FIELDS.items())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def _values(self) -> Tuple[Any, ...]:
+        return (*self.key, self.price, self.description)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ProductRecord):
+            return self._values() == other._values()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ProductRecord({self.to_dict()!r})"
+
+
+def as_record(rec: Any) -> ProductRecord:
+    """ProductRecord for a record that may still be a plain dict."""
+
+    return rec if isinstance(rec, ProductRecord) else ProductRecord.from_dict(rec)
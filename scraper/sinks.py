@@ -0,0 +1,98 @@
+import os
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Sequence, Tuple, Type
+
+from scraper import metrics
+
+logger = logging.getLogger(__name__)
+
+# Backoff between whole-sink retries (seconds, doubled per attempt)
+BACKOFF_BASE = float(os.getenv("SINK_BACKOFF_BASE", 2.0))
+
+
+class Sink:
+    """One output of a run (Sheets, email...): a name and a callable that
+    publishes the run's results.
+
+    A failing publish is retried `retries` times, but only for the
+    exception types in retry_on: a sink whose publish is not safe to
+    repeat as a whole (e.g. because it appends rows) keeps retries=0 and
+    retries its individual requests itself.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        publish: Callable[[], None],
+        retries: int = 0,
+        retry_on: Tuple[Type[BaseException], ...] = (),
+    ) -> None:
+        self.name = name
+        self.publish = publish
+        self.retries = retries
+        self.retry_on = retry_on
+
+    def run(self) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                with metrics.timer(f"sink.{self.name}"):
+                    self.publish()
+                return
+            except self.retry_on as e:
+                if attempt == self.retries:
+                    raise
+                delay = BACKOFF_BASE * 2**attempt + random.uniform(0, BACKOFF_BASE)
+                metrics.incr(f"sink.{self.name}.retries")
+                logger.warning(
+                    "Sink %s failed (%s), retrying in %.1fs (%d/%d)",
+                    self.name,
+                    e,
+                    delay,
+                    attempt + 1,
+                    self.retries,
+                )
+                time.sleep(delay)
+
+
+class SinkError(Exception):
+    """Raised once every sink has finished if any of them failed."""
+
+    def __init__(self, failures: Dict[str, BaseException]) -> None:
+        self.failures = failures
+        super().__init__(
+            "Sink(s) failed: "
+            + ", ".join(f"{name} ({e!r})" for name, e in failures.items())
+        )
+
+
+@metrics.timer("sinks.publish")
+def publish_all(sinks: Sequence[Sink]) -> None:
+    """Run every sink at once, each in its own thread.
+
+    Sinks are isolated from each other: a slow or failing sink neither
+    delays nor cancels the others, so publishing takes as long as the
+    slowest sink rather than the sum of all of them. Failures are logged
+    as they happen and raised together as a SinkError at the end.
+    """
+
+    if not sinks:
+        return
+
+    failures: Dict[str, BaseException] = {}
+    with ThreadPoolExecutor(max_workers=len(sinks), thread_name_prefix="sink") as pool:
+        futures = {pool.submit(sink.run): sink for sink in sinks}
+        for future in as_completed(futures):
+            sink = futures[future]
+            e = future.exception()
+            if e is None:
+                logger.info("Sink %s published", sink.name)
+                continue
+            metrics.incr(f"sink.{sink.name}.failed")
+            logger.error("Sink %s failed", sink.name, exc_info=e)
+            failures[sink.name] = e
+
+    if failures:
+        raise SinkError(failures)
@@ -0,0 +1,293 @@
+import os
+import atexit
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Playwright,
+    Request,
+    Response,
+    Route,
+    async_playwright,
+)
+
+logger = logging.getLogger(__name__)
+
+BROWSER_TYPE = os.getenv("PLAYWRIGHT_BROWSER", "firefox")
+# Contexts open at the same time (one page each)
+MAX_CONTEXTS = int(os.getenv("PLAYWRIGHT_MAX_CONTEXTS", 4))
+# A context is closed and replaced after this many uses
+CONTEXT_MAX_USES = int(os.getenv("PLAYWRIGHT_CONTEXT_MAX_USES", 10))
+# Overall deadline for a capture, navigation included
+CAPTURE_TIMEOUT = float(os.getenv("PLAYWRIGHT_CAPTURE_TIMEOUT", 30))
+
+# Requests aborted during captures: nothing we read is rendered or tracked
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+BLOCKED_URL_PARTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "clarity.ms",
+    "tiktok.com",
+    "/gtag/",
+    "/analytics",
+)
+
+T = TypeVar("T")
+
+
+class Captured(NamedTuple):
+    """A response body captured from the page, with the URL it came from."""
+
+    url: str
+    body: str
+
+
+def _is_blocked(request: Request) -> bool:
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    return any(part in request.url for part in BLOCKED_URL_PARTS)
+
+
+async def _block_unneeded(route: Route) -> None:
+    if _is_blocked(route.request):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def _retrieve(fut: asyncio.Future) -> None:
+    # Outcome of a future nobody awaits any more; retrieving it stops asyncio
+    # logging "exception was never retrieved" after a timeout or failure
+    if not fut.cancelled():
+        fut.exception()
+
+
+async def capture_responses(
+    context: BrowserContext,
+    url: str,
+    patterns: Sequence[str],
+    accept: Optional[Callable[[str], bool]] = None,
+    timeout: float = CAPTURE_TIMEOUT,
+) -> Dict[str, Captured]:
+    """Open url and return the first matching response for each pattern.
+
+    A response matches a pattern when the pattern is a substring of its URL,
+    its status is 200 and `accept(body)` (if given) is true. The call returns
+    as soon as every pattern has matched instead of waiting for the page to
+    settle, and raises TimeoutError once `timeout` seconds have passed.
+    """
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    pending: Dict[str, asyncio.Future] = {p: loop.create_future() for p in patterns}
+
+    async def handle_response(response: Response) -> None:
+        waiting = [
+            p for p, fut in pending.items() if p in response.url and not fut.done()
+        ]
+        if not waiting or response.status != 200:
+            return
+        try:
+            body = await response.text()
+        except Exception as e:
+            logger.warning("Could not read %s: %s", response.url, e)
+            return
+        if accept is not None and not accept(body):
+            return
+        for p in waiting:
+            if not pending[p].done():
+                pending[p].set_result(Captured(response.url, body))
+
+    page = await context.new_page()
+    try:
+        await page.route("**/*", _block_unneeded)
+        page.on("response", handle_response)
+
+        captured = asyncio.ensure_future(asyncio.gather(*pending.values()))
+        navigation = asyncio.ensure_future(
+            page.goto(url, wait_until="commit", timeout=timeout * 1000)
+        )
+        try:
+            done, _ = await asyncio.wait(
+                {captured, navigation},
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            # A failed navigation will never produce the responses we wait for
+            if navigation in done and navigation.exception() is not None:
+                raise navigation.exception()
+            if captured not in done:
+                await asyncio.wait_for(captured, max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            missing = [
+                p for p, fut in pending.items() if fut.cancelled() or not fut.done()
+            ]
+            raise TimeoutError(f"Timed out capturing {missing} from {url}") from None
+        finally:
+            navigation.cancel()
+            captured.cancel()
+            for fut in (navigation, captured):
+                fut.add_done_callback(_retrieve)
+    finally:
+        await page.close()
+
+    return {p: fut.result() for p, fut in pending.items()}
+
+
+class BrowserPool:
+    """One long-lived browser shared by all Playwright sites.
+
+    The browser lives on a dedicated event loop thread, so callers on any
+    thread (including the site fetcher's worker pool) can borrow a context
+    through `run` without starting their own asyncio loop or browser.
+    """
+
+    def __init__(
+        self,
+        browser_type: str = BROWSER_TYPE,
+        max_contexts: int = MAX_CONTEXTS,
+        context_max_uses: int = CONTEXT_MAX_USES,
+    ) -> None:
+        self.browser_type = browser_type
+        self.max_contexts = max_contexts
+        self.context_max_uses = context_max_uses
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._launch_lock: Optional[asyncio.Lock] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: List[Tuple[BrowserContext, int]] = []
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=loop.run_forever, name="browser-pool", daemon=True
+                )
+                self._thread.start()
+                self._loop = loop
+        return self._loop
+
+    async def _ensure_browser(self) -> Browser:
+        if self._launch_lock is None:
+            self._launch_lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_contexts)
+
+        async with self._launch_lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                launcher = getattr(self._playwright, self.browser_type)
+                self._browser = await launcher.launch(headless=True)
+                self._idle.clear()
+                logger.info("Launched shared %s browser", self.browser_type)
+        return self._browser
+
+    async def _acquire(self) -> Tuple[BrowserContext, int]:
+        browser = await self._ensure_browser()
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop()
+        try:
+            return await browser.new_context(), 0
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def _release(self, context: BrowserContext, uses: int, healthy: bool) -> None:
+        try:
+            if healthy and uses < self.context_max_uses:
+                self._idle.append((context, uses))
+            else:
+                await context.close()
+        finally:
+            self._slots.release()
+
+    async def _run(self, fn: Callable[[BrowserContext], Awaitable[T]]) -> T:
+        context, uses = await self._acquire()
+        healthy = False
+        try:
+            result = await fn(context)
+            healthy = True
+            return result
+        finally:
+            await self._release(context, uses + 1, healthy)
+
+    def run(self, fn: Callable[[BrowserContext], Awaitable[T]]) -> T:
+        """Run `fn(context)` on a pooled browser context and return its result."""
+
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._run(fn), loop).result()
+
+    def capture(
+        self,
+        url: str,
+        patterns: Sequence[str],
+        accept: Optional[Callable[[str], bool]] = None,
+        timeout: float = CAPTURE_TIMEOUT,
+    ) -> Dict[str, Captured]:
+        """Blocking wrapper around `capture_responses` on a pooled context."""
+
+        return self.run(
+            lambda context: capture_responses(context, url, patterns, accept, timeout)
+        )
+
+    async def _close(self) -> None:
+        for context, _ in self._idle:
+            await context.close()
+        self._idle.clear()
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def close(self) -> None:
+        """Close the browser and stop the loop thread; the pool can be reused after."""
+
+        with self._start_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result()
+        except Exception as e:
+            logger.warning("Error while closing browser pool: %s", e)
+        finally:
+            self._launch_lock = None
+            self._slots = None
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join()
+            loop.close()
+
+
+@lru_cache(maxsize=1)
+def get_pool() -> BrowserPool:
+    pool = BrowserPool()
+    atexit.register(pool.close)
+    return pool
@@ -0,0 +1,50 @@
+import re
+import hashlib
+from typing import Iterable, List, Optional, Pattern
+
+# Tokens that change on every request without the menu changing
+DEFAULT_VOLATILE_PATTERNS: List[str] = [
+    # CSRF / form tokens
+    r'<input[^>]+name="(?:csrf[^"]*|_token|authenticity_token|__RequestVerificationToken)"[^>]*>',
+    r'<meta[^>]+name="csrf-[^"]*"[^>]*>',
+    # CSP nonces and WordPress nonces in inline config
+    r'\bnonce="[^"]*"',
+    r'"[A-Za-z_]*nonce"\s*:\s*"[^"]*"',
+    # Asset cache busters (?ver=6.4.2, ?v=1718000000)
+    r"\?(?:ver|v)=[\w.\-]+",
+    # Server-side render timestamps left in comments
+    r"<!--[^>]*?\d{2}:\d{2}:\d{2}[^>]*?-->",
+]
+
+_WHITESPACE = re.compile(r"\s+")
+
+_compiled_cache = {}
+
+
+def _compile(patterns: Iterable[str]) -> List[Pattern]:
+    compiled = []
+    for pattern in patterns:
+        regex = _compiled_cache.get(pattern)
+        if regex is None:
+            regex = _compiled_cache[pattern] = re.compile(pattern, re.I | re.S)
+        compiled.append(regex)
+    return compiled
+
+
+def normalise(body: str, volatile_patterns: Optional[Iterable[str]] = None) -> str:
+    """Strip volatile tokens and collapse whitespace so equal menus compare equal."""
+
+    patterns = list(DEFAULT_VOLATILE_PATTERNS)
+    if volatile_patterns:
+        patterns.extend(volatile_patterns)
+
+    for regex in _compile(patterns):
+        body = regex.sub("", body)
+    return _WHITESPACE.sub(" ", body).strip()
+
+
+def fingerprint(body: str, volatile_patterns: Optional[Iterable[str]] = None) -> str:
+    """Return a stable hash of the normalised body."""
+
+    normalised = normalise(body, volatile_patterns)
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()
@@ -0,0 +1,101 @@
+import os
+import logging
+import requests
+from functools import lru_cache
+from typing import FrozenSet, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
+from scraper import metrics
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 20))
+
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.5))
+BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", 0.5))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Connections kept alive per host; matches the per-host fetch limit headroom
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 10))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10))
+
+
+def retry_policy(
+    allowed_methods: FrozenSet[str],
+    retries: Optional[int] = None,
+    backoff_factor: Optional[float] = None,
+    backoff_jitter: Optional[float] = None,
+) -> Retry:
+    """Retries on connection errors and RETRY_STATUSES for the given
+    methods, honouring Retry-After; unset settings default to HTTP_*."""
+
+    retries = MAX_RETRIES if retries is None else retries
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=allowed_methods,
+        backoff_factor=BACKOFF_FACTOR if backoff_factor is None else backoff_factor,
+        backoff_jitter=BACKOFF_JITTER if backoff_jitter is None else backoff_jitter,
+        respect_retry_after_header=True,
+        # Let the caller's raise_for_status() report the final status
+        raise_on_status=False,
+    )
+
+
+def pooled_session(allowed_methods: FrozenSet[str], **retry) -> requests.Session:
+    """A new session with a keep-alive pool and retry_policy(allowed_methods,
+    **retry) mounted for http and https."""
+
+    session = requests.Session()
+
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry_policy(allowed_methods, **retry),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@lru_cache(maxsize=1)
+def _init_session() -> requests.Session:
+    session = pooled_session(frozenset({"GET", "HEAD"}))
+
+    # gzip/deflate always, br when a brotli decoder is installed
+    session.headers.update(make_headers(accept_encoding=True))
+
+    logger.info(
+        "HTTP session ready (accept-encoding: %s)",
+        session.headers.get("accept-encoding"),
+    )
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the shared, pooled HTTP session."""
+    return _init_session()
+
+
+def default_timeout() -> Tuple[float, float]:
+    return (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """GET through the shared session with separate connect/read timeouts and retries."""
+
+    kwargs.setdefault("timeout", default_timeout())
+    with metrics.timer("http.get"):
+        response = get_session().get(url, **kwargs)
+
+    metrics.incr("http.requests")
+    metrics.incr("http.bytes_fetched", len(response.content))
+    if response.status_code == 304:
+        metrics.incr("http.not_modified")
+    return response
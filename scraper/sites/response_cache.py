@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from scraper.fsutil import CACHE_DIR as _CACHE_ROOT, write_atomic
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("SCRAPER_CACHE_DIR", os.path.join(_CACHE_ROOT, "http"))
+CACHE_ENABLED = os.getenv("SCRAPER_HTTP_CACHE", "1") != "0"
+
+
+def _entry_path(url: str, suffix: str) -> str:
+    digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{digest}.{suffix}")
+
+
+def load(url: str) -> Optional[Dict[str, Any]]:
+    """Return the cached entry for url (metadata plus body), or None."""
+
+    if not CACHE_ENABLED:
+        return None
+
+    try:
+        with open(_entry_path(url, "json"), encoding="utf-8") as f:
+            entry = json.load(f)
+        with open(_entry_path(url, "body"), encoding="utf-8") as f:
+            entry["body"] = f.read()
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable cache entry for %s: %s", url, e)
+        return None
+
+    return entry
+
+
+def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Validators to send so the server can answer 304 Not Modified."""
+
+    headers: Dict[str, str] = {}
+    if not entry:
+        return headers
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def store_response(
+    url: str,
+    body: str,
+    etag: Optional[str],
+    last_modified: Optional[str],
+    source_url: Optional[str] = None,
+) -> None:
+    """Store a freshly downloaded body.
+
+    `source_url` records where the body actually came from when it differs
+    from url (e.g. a JSON endpoint behind a browser-rendered page).
+    Previously parsed records are kept; they carry the fingerprint of the
+    body they were parsed from and are only reused while it still matches.
+    """
+
+    if not CACHE_ENABLED:
+        return
+
+    entry = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "source_url": source_url,
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+        "records": None,
+    }
+    try:
+        with open(_entry_path(url, "json"), encoding="utf-8") as f:
+            entry["records"] = json.load(f).get("records")
+    except (OSError, ValueError):
+        pass
+
+    try:
+        write_atomic(_entry_path(url, "body"), body)
+        write_atomic(_entry_path(url, "json"), json.dumps(entry, ensure_ascii=False))
+    except OSError as e:
+        logger.warning("Could not cache response for %s: %s", url, e)
+
+
+def store_records(
+    url: str, records: List[Dict[str, Any]], owner: str, fingerprint: str
+) -> None:
+    """Attach parsed records to the cached entry for url.
+
+    `owner` identifies the site and the parser version and options that
+    produced the records, so records are reused only by that same parser;
+    `fingerprint` is the hash of the body they were parsed from.
+    """
+
+    if not CACHE_ENABLED:
+        return
+
+    path = _entry_path(url, "json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+        entry["records"] = {
+            "owner": owner,
+            "fingerprint": fingerprint,
+            "items": records,
+        }
+        write_atomic(path, json.dumps(entry, ensure_ascii=False))
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logger.warning("Could not cache records for %s: %s", url, e)
+
+
+def cached_records(
+    entry: Optional[Dict[str, Any]], owner: str, fingerprint: str
+) -> Optional[List[Dict[str, Any]]]:
+    """Return records `owner` parsed from a body with this fingerprint, if any."""
+
+    if not entry or not entry.get("records"):
+        return None
+    records = entry["records"]
+    if records.get("owner") != owner or records.get("fingerprint") != fingerprint:
+        return None
+    return records["items"]
@@ -1,30 +1,252 @@
 import os
+import sys
+import hashlib
 import logging
+import threading
 import requests
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+from scraper import metrics
+from scraper.parsers import html_backend
+from scraper.records import ProductRecord, as_record
+from . import http_client, response_cache
+from .browser_pool import CAPTURE_TIMEOUT, get_pool
+from .fingerprint import fingerprint
 from .sites import SITES, SITES_TO_TEST
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on sites fetched and parsed at the same time
+MAX_WORKERS = int(os.getenv("SCRAPER_MAX_WORKERS", 8))
+# Upper bound on concurrent requests against a single host
+MAX_PER_HOST = int(os.getenv("SCRAPER_MAX_PER_HOST", 2))
 
-def _fetch_html(site: Dict[str, any]) -> str:
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+
+
+def _host_slot(url: str) -> threading.BoundedSemaphore:
+    """Return the semaphore limiting concurrent requests to the url's host."""
+
+    host = urlsplit(url).hostname or ""
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+    return slot
+
+
+def _fetch_html(site: Dict[str, any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Download the site's page with a conditional GET.
+
+    Returns the html together with the cache entry from the previous run
+    (None if there was none), whose parsed records may still be reusable.
+    """
 
     DEBUG = False
 
-    response = requests.get(site["url"], timeout=10)
+    url = site["url"]
+    entry = response_cache.load(url)
+
+    response = http_client.get(url, headers=response_cache.conditional_headers(entry))
+
+    if response.status_code == 304 and entry is not None:
+        logger.info("%s not modified since %s", site["id"], entry.get("fetched_at"))
+        return entry["body"], entry
+
     response.raise_for_status()
     html = response.text
 
+    response_cache.store_response(
+        url,
+        html,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+    )
+
     if DEBUG:
         _save_html(html, "site.html")
 
-    return html
+    return html, entry
 
 
-def get_site_records(scope: str = "prod") -> List[Dict[str, Any]]:
-    """Fetch and parse new records from all configured sites."""
+def _capture_payload(
+    site: Dict[str, Any], previous: Optional[Dict[str, Any]]
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Load the site in the shared browser and return the body it declared.
+
+    Playwright sites list the response URL pattern(s) they need under
+    site["capture"]; the parser receives the captured body (or a
+    pattern -> body dict when several patterns are declared).
+    """
+
+    url = site["url"]
+    capture = site["capture"]
+
+    metrics.incr("playwright.captures")
+    captured = get_pool().capture(
+        url,
+        capture["patterns"],
+        accept=site.get("payload_check"),
+        timeout=capture.get("timeout", CAPTURE_TIMEOUT),
+    )
+
+    if len(captured) > 1:
+        return {pattern: c.body for pattern, c in captured.items()}, None
+
+    # Remember where the data came from so the next run can call it directly
+    response = next(iter(captured.values()))
+    response_cache.store_response(
+        url, response.body, etag=None, last_modified=None, source_url=response.url
+    )
+    return response.body, previous
+
+
+def _fetch_json(site: Dict[str, Any], endpoint: str) -> Optional[str]:
+    """Call a JSON endpoint directly; None if it fails or has the wrong shape."""
+
+    try:
+        response = http_client.get(endpoint, headers={"Accept": "application/json"})
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning("Direct JSON fetch failed for %s: %s", site["id"], e)
+        return None
+
+    body = response.text
+    check = site.get("payload_check")
+    if check is not None and not check(body):
+        logger.warning(
+            "Direct JSON fetch for %s returned an unexpected shape", site["id"]
+        )
+        return None
+    return body
+
+
+def _fetch_api_payload(site: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Fetch a site's data from its JSON endpoint, falling back to the browser.
+
+    The endpoint is site["json_url"] when declared, otherwise the URL the
+    browser captured the data from on the previous run.
+    """
+
+    url = site["url"]
+    previous = response_cache.load(url)
+    endpoint = site.get("json_url") or (previous or {}).get("source_url")
+
+    if endpoint:
+        body = _fetch_json(site, endpoint)
+        if body is not None:
+            response_cache.store_response(
+                url, body, etag=None, last_modified=None, source_url=endpoint
+            )
+            return body, previous
+
+    if not site.get("needs_playwright"):
+        raise RuntimeError(f"No usable JSON endpoint for {site['id']}")
+
+    logger.info("Falling back to browser capture for %s", site["id"])
+    return _capture_payload(site, previous)
+
 
-    raw_site_records = []
+@lru_cache(maxsize=None)
+def _source_hash(module_name: str) -> str:
+    """Hash of a module's source file, so edits to it show up as a new version."""
+
+    with open(sys.modules[module_name].__file__, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+
+
+def _parser_meta(site: Dict[str, Any]) -> Dict[str, Any]:
+    """Everything the parser is given besides the body."""
+
+    return {
+        "restaurant": site["restaurant"],
+        "product_type": site["product_type"],
+        "html_backend": site.get("html_backend"),
+        "scope": site.get("scope"),
+    }
+
+
+def _records_owner(site: Dict[str, Any]) -> str:
+    """Identity of what turned a body into records: the site, its parser at
+    its current source, and the metadata it is given. Cached records of
+    any other owner, e.g. from before a parser fix or a SITES edit, are
+    parsed again."""
+
+    parser = site["parser"]
+    meta = _parser_meta(site)
+    meta["html_backend"] = meta["html_backend"] or html_backend.DEFAULT_BACKEND
+    version = hashlib.blake2b(
+        "|".join(
+            (
+                _source_hash(parser.__module__),
+                _source_hash(html_backend.__name__),
+                repr(sorted(meta.items())),
+            )
+        ).encode("utf-8"),
+        digest_size=8,
+    ).hexdigest()
+    return f"{site['id']}:{parser.__module__}.{parser.__qualname__}@{version}"
+
+
+def _parse_site(site: Dict[str, Any], html: str) -> List[ProductRecord]:
+    with metrics.timer(f"parse.{site['id']}"):
+        parsed = site["parser"](html, _parser_meta(site))
+
+    if not isinstance(parsed, list):
+        raise ValueError(f"Parser {site['id']} returned non-list: {type(parsed)}")
+
+    # Parsers still emitting plain dicts are converted here
+    return [as_record(rec) for rec in parsed]
+
+
+def _get_records_for_site(site: Dict[str, Any]) -> List[ProductRecord]:
+    """Fetch and parse a single site, holding a host slot while on the network."""
+
+    try:
+        with _host_slot(site["url"]), metrics.timer(f"fetch.{site['id']}"):
+            if site.get("needs_playwright") or site.get("json_url"):
+                html, previous = _fetch_api_payload(site)
+            else:
+                html, previous = _fetch_html(site)
+
+        if not isinstance(html, str):
+            parsed = _parse_site(site, html)
+        else:
+            # Skip parsing when the page is unchanged since the last run
+            owner = _records_owner(site)
+            body_hash = fingerprint(html, site.get("volatile_patterns"))
+            parsed = response_cache.cached_records(previous, owner, body_hash)
+            if parsed is None:
+                parsed = _parse_site(site, html)
+                response_cache.store_records(
+                    site["url"], [rec.to_dict() for rec in parsed], owner, body_hash
+                )
+            else:
+                parsed = [ProductRecord.from_dict(rec) for rec in parsed]
+                metrics.incr("records.cache_hits")
+                logger.info("Page unchanged, reusing cached records for %s", site["id"])
+    except Exception as e:
+        logger.error("Parse error on %s: %s", site["id"], e, exc_info=True)
+        raise
+
+    metrics.incr("records.parsed", len(parsed))
+    logger.info("Fetched %d records from %s", len(parsed), site["id"])
+    return parsed
+
+
+def iter_site_records(
+    scope: str = "prod",
+) -> Iterator[Tuple[int, Dict[str, Any], List[Dict[str, Any]]]]:
+    """Fetch and parse all configured sites concurrently, yielding
+    (index in the site list, site, records) as each site completes.
+
+    Downstream stages can work on a site while slower ones are still
+    loading. If a site fails, or the caller stops iterating, the sites
+    not yet started are cancelled.
+    """
 
     if scope == "test":
         sites = SITES_TO_TEST
@@ -33,30 +255,34 @@ def get_site_records(scope: str = "prod") -> List[Dict[str, Any]]:
     else:
         raise ValueError(f"Invalid scope: {scope!r}. Use 'prod' or 'test'.")
 
-    for site in sites:
+    workers = max(1, min(MAX_WORKERS, len(sites)))
 
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="site") as pool:
+        futures = {
+            pool.submit(_get_records_for_site, site): (index, site)
+            for index, site in enumerate(sites)
+        }
         try:
+            for future in as_completed(futures):
+                index, site = futures[future]
+                yield index, site, future.result()
+        finally:
+            for future in futures:
+                future.cancel()
 
-            if site.get("needs_playwright"):
-                html = site["url"]  # No html, url is needed
-            else:
-                html = _fetch_html(site)
-
-            parsed = site["parser"](
-                html,
-                {
-                    "restaurant": site["restaurant"],
-                    "product_type": site["product_type"],
-                },
-            )
-        except Exception as e:
-            logger.error("Parse error on %s: %s", site["id"], e, exc_info=True)
-            raise
 
-        if not isinstance(parsed, list):
-            raise ValueError(f"Parser {site['id']} returned non-list: {type(parsed)}")
+def get_site_records(scope: str = "prod") -> List[Dict[str, Any]]:
+    """Fetch and parse new records from all configured sites concurrently.
+
+    Records are returned in the order of the site list, regardless of
+    which site finishes first.
+    """
+
+    batches: Dict[int, List[Dict[str, Any]]] = {}
+    for index, _, records in iter_site_records(scope):
+        batches[index] = records
 
-        raw_site_records.extend(parsed)
+    raw_site_records = [rec for index in sorted(batches) for rec in batches[index]]
 
     logger.info("Total new records fetched: %d", len(raw_site_records))
 
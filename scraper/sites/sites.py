@@ -1,7 +1,12 @@
+import re
 from typing import Any, Dict, List
 
 from scraper.parsers import bellozzo, pizzahut, etna, donnamamma
 
+# Any element carrying the menu-item-box class token; a plain string would
+# only match a class attribute that is exactly "menu-item-box"
+_BELLOZZO_SCOPE = {"attrs": {"class": re.compile(r"(?:^|\s)menu-item-box(?:\s|$)")}}
+
 
 SITES: List[Dict[str, any]] = [
     {
@@ -9,6 +14,7 @@ SITES: List[Dict[str, any]] = [
         "restaurant": "Bellozzo",
         "product_type": "pizza",
         "url": "https://www.bellozzo.hu/menunk/pizzak.html",
+        "scope": _BELLOZZO_SCOPE,
         "parser": bellozzo.parse,
     },
     {
@@ -16,6 +22,7 @@ SITES: List[Dict[str, any]] = [
         "restaurant": "Bellozzo",
         "product_type": "pasta",
         "url": "https://www.bellozzo.hu/menunk/tesztak.html",
+        "scope": _BELLOZZO_SCOPE,
         "parser": bellozzo.parse,
     },
     {
@@ -37,6 +44,7 @@ SITES: List[Dict[str, any]] = [
         "restaurant": "Donna Mamma",
         "product_type": "pizza",
         "url": "https://www.donnamamma.hu/etlap/",
+        "scope": {"name": "section"},
         "parser": donnamamma.parse,
     },
     {
@@ -45,6 +53,10 @@ SITES: List[Dict[str, any]] = [
         "product_type": "both",
         "url": "https://pizzahut.hu/menu-takeaway#pizzak",
         "needs_playwright": True,
+        # No json_url declared: the menu endpoint captured by the browser is
+        # remembered and called directly on later runs
+        "capture": {"patterns": [pizzahut.MENU_RESPONSE_PATTERN]},
+        "payload_check": pizzahut.is_menu_payload,
         "parser": pizzahut.parse,
     },
 ]
@@ -57,6 +69,8 @@ SITES_TO_TEST: List[Dict[str, Any]] = [
         "product_type": "both",
         "url": "https://pizzahut.hu/menu-takeaway#pizzak",
         "needs_playwright": True,
+        "capture": {"patterns": [pizzahut.MENU_RESPONSE_PATTERN]},
+        "payload_check": pizzahut.is_menu_payload,
         "parser": pizzahut.parse,
     },
 ]
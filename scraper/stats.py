@@ -0,0 +1,85 @@
+import math
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+
+class PriceStats:
+    """Mergeable price distribution of one (restaurant, type) bucket.
+
+    Menu prices take few distinct values (a few dozen per restaurant), so
+    the distribution is kept exactly as price -> number of products. That
+    makes every statistic exact, two partials merge by adding counts, and
+    a changed or deleted product can be taken out again, which a lossy
+    quantile sketch could not do.
+    """
+
+    __slots__ = ("_counts", "count", "total")
+
+    def __init__(self, prices: Iterable[int] = ()) -> None:
+        self._counts: Counter = Counter()
+        self.count = 0
+        self.total = 0
+        for price in prices:
+            self.add(price)
+
+    def add(self, price: int, n: int = 1) -> None:
+        self._counts[price] += n
+        self.count += n
+        self.total += price * n
+
+    def remove(self, price: int, n: int = 1) -> None:
+        left = self._counts[price] - n
+        if left < 0:
+            raise ValueError(f"Price {price} was not counted {n} time(s)")
+        if left:
+            self._counts[price] = left
+        else:
+            del self._counts[price]
+        self.count -= n
+        self.total -= price * n
+
+    def merge(self, other: "PriceStats") -> "PriceStats":
+        """Add other's products to these stats (in place) and return them."""
+
+        self._counts.update(other._counts)
+        self.count += other.count
+        self.total += other.total
+        return self
+
+    @property
+    def lowest(self) -> Optional[int]:
+        return min(self._counts) if self._counts else None
+
+    @property
+    def highest(self) -> Optional[int]:
+        return max(self._counts) if self._counts else None
+
+    @property
+    def average(self) -> Optional[int]:
+        # Truncated, as the Averages tab always showed it
+        return int(self.total / self.count) if self.count else None
+
+    def quantile(self, q: float) -> Optional[int]:
+        """Nearest-rank quantile (q=0.5 is the median, q=0.9 the p90)."""
+
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for price in sorted(self._counts):
+            seen += self._counts[price]
+            if seen >= rank:
+                return price
+        return self.highest
+
+    def to_dict(self) -> Dict[str, int]:
+        """JSON-safe form of the distribution (see from_dict)."""
+
+        return {str(price): n for price, n in sorted(self._counts.items())}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, int]) -> "PriceStats":
+        stats = cls()
+        for price, n in data.items():
+            stats.add(int(price), n)
+        return stats
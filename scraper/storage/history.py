@@ -0,0 +1,346 @@
+import os
+import json
+import hashlib
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from scraper import metrics
+from scraper.fsutil import CACHE_DIR, write_atomic
+from scraper.storage.sheet_constants import (
+    COL_DATE,
+    COL_RESTAURANT,
+    COL_TYPE,
+    COL_NAME,
+    COL_PRICE,
+    COL_DESCRIPTION,
+    COL_OLD_PRICE,
+    COL_NEW_PRICE,
+)
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = os.getenv("HISTORY_DIR", os.path.join(CACHE_DIR, "history"))
+
+# One partition file per month holds these columns, rows sorted by
+# (product, day) so one product's observations are a contiguous slice
+_COLUMNS = (("product", "I"), ("day", "i"), ("price", "i"), ("desc", "q"))
+_DICTIONARY = "products.json"
+
+ProductKey = Tuple[str, str, str]
+
+
+def description_hash(description: str) -> int:
+    """64-bit fingerprint of a description; only equality matters."""
+
+    digest = hashlib.blake2b(
+        (description or "").strip().encode("utf-8"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def _month(day: date) -> str:
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def _months(since: date, until: date) -> List[str]:
+    months = []
+    year, month = since.year, since.month
+    while (year, month) <= (until.year, until.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class _Dictionary:
+    """(restaurant, type, name) <-> dense integer id, append-only on disk."""
+
+    def __init__(self, root: str) -> None:
+        self.path = os.path.join(root, _DICTIONARY)
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.keys: List[ProductKey] = [tuple(k) for k in json.load(f)]
+        except FileNotFoundError:
+            self.keys = []
+        self.ids: Dict[ProductKey, int] = {k: i for i, k in enumerate(self.keys)}
+        self._dirty = False
+
+    def id_for(self, key: ProductKey) -> int:
+        pid = self.ids.get(key)
+        if pid is None:
+            pid = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+            self._dirty = True
+        return pid
+
+    def save(self) -> None:
+        if self._dirty:
+            data = json.dumps(self.keys, ensure_ascii=False).encode("utf-8")
+            write_atomic(self.path, data)
+            self._dirty = False
+
+
+class _Partition:
+    """One month of observations as parallel typed arrays."""
+
+    def __init__(self) -> None:
+        for column, typecode in _COLUMNS:
+            setattr(self, column, array(typecode))
+
+    def __len__(self) -> int:
+        return len(self.product)
+
+    @classmethod
+    def load(cls, path: str) -> "_Partition":
+        part = cls()
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            for column, typecode in _COLUMNS:
+                values = getattr(part, column)
+                values.frombytes(f.read(header["rows"] * values.itemsize))
+        return part
+
+    def save(self, path: str) -> None:
+        header = json.dumps({"rows": len(self)}).encode("utf-8") + b"\n"
+        body = b"".join(getattr(self, column).tobytes() for column, _ in _COLUMNS)
+        write_atomic(path, header + body)
+
+    def rows_of(self, pid: int) -> Tuple[int, int]:
+        """Index range of one product's rows."""
+
+        return bisect_left(self.product, pid), bisect_right(self.product, pid)
+
+
+@lru_cache(maxsize=64)
+def _cached_partition(path: str, version: Tuple[int, int, int]) -> _Partition:
+    return _Partition.load(path)
+
+
+@lru_cache(maxsize=4)
+def _cached_dictionary(path: str, version: Tuple[int, int, int]) -> _Dictionary:
+    return _Dictionary(os.path.dirname(path))
+
+
+def _version(path: str) -> Tuple[int, int, int]:
+    """Changes whenever the file is rewritten: every write replaces it with a
+    new inode, which a coarse mtime alone could miss."""
+
+    st = os.stat(path)
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _read_dictionary(root: str) -> _Dictionary:
+    """The dictionary for queries, parsed once per version of the file."""
+
+    path = os.path.join(root, _DICTIONARY)
+    try:
+        return _cached_dictionary(path, _version(path))
+    except FileNotFoundError:
+        return _Dictionary(root)
+
+
+def _partition(root: str, month: str) -> Optional[_Partition]:
+    path = os.path.join(root, f"{month}.col")
+    try:
+        return _cached_partition(path, _version(path))
+    except FileNotFoundError:
+        return None
+
+
+class HistoryWriter:
+    """Adds one day of observed products to the history, batch by batch.
+
+    Rows are encoded as they are added and written to the month's
+    partition on commit(); re-recording a day replaces it.
+    """
+
+    def __init__(self, day: Optional[date] = None, root: Optional[str] = None):
+        self.day = day or date.today()
+        self.root = root or HISTORY_DIR
+        os.makedirs(self.root, exist_ok=True)
+        self._dictionary = _Dictionary(self.root)
+        self._rows: Dict[int, Tuple[int, int]] = {}
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        id_for = self._dictionary.id_for
+        for rec in records:
+            pid = id_for((rec[COL_RESTAURANT], rec[COL_TYPE], rec[COL_NAME]))
+            self._rows[pid] = (
+                int(rec[COL_PRICE]),
+                description_hash(rec[COL_DESCRIPTION]),
+            )
+
+    @metrics.timer("history.write")
+    def commit(self) -> None:
+        month = _month(self.day)
+        day = self.day.toordinal()
+        old = _partition(self.root, month) or _Partition()
+
+        rows = [
+            (old.product[i], old.day[i], old.price[i], old.desc[i])
+            for i in range(len(old))
+            if old.day[i] != day
+        ]
+        rows.extend(
+            (pid, day, price, desc) for pid, (price, desc) in self._rows.items()
+        )
+        rows.sort()
+
+        part = _Partition()
+        for (column, _), values in zip(_COLUMNS, zip(*rows) if rows else ()):
+            getattr(part, column).extend(values)
+
+        # Dictionary first: a partition must never reference unknown ids
+        self._dictionary.save()
+        part.save(os.path.join(self.root, f"{month}.col"))
+        logger.info(
+            "Recorded %d products for %s in history partition %s",
+            len(self._rows),
+            self.day.isoformat(),
+            month,
+        )
+
+
+def record_day(
+    records: Iterable[Dict[str, Any]],
+    day: Optional[date] = None,
+    root: Optional[str] = None,
+) -> None:
+    writer = HistoryWriter(day, root)
+    writer.add(records)
+    writer.commit()
+
+
+def _range(since: Optional[date], until: Optional[date], root: str) -> List[str]:
+    if since is None:
+        found = sorted(f[:-4] for f in os.listdir(root) if f.endswith(".col"))
+        if not found:
+            return []
+        first = date.fromisoformat(found[0] + "-01")
+    else:
+        first = since
+    return _months(first, until or date.today())
+
+
+@metrics.timer("history.query")
+def price_history(
+    restaurant: str,
+    product_type: str,
+    name: str,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    root: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Every observation of one product, oldest first:
+    [{Date, Price, "Description Hash"}, ...]."""
+
+    root = root or HISTORY_DIR
+    if not os.path.isdir(root):
+        return []
+    pid = _read_dictionary(root).ids.get((restaurant, product_type, name))
+    if pid is None:
+        return []
+
+    lo_day = since.toordinal() if since else 0
+    hi_day = until.toordinal() if until else date.max.toordinal()
+
+    out: List[Dict[str, Any]] = []
+    for month in _range(since, until, root):
+        part = _partition(root, month)
+        if part is None:
+            continue
+        start, end = part.rows_of(pid)
+        start = bisect_left(part.day, lo_day, start, end)
+        end = bisect_right(part.day, hi_day, start, end)
+        for i in range(start, end):
+            out.append(
+                {
+                    COL_DATE: date.fromordinal(part.day[i]).isoformat(),
+                    COL_PRICE: part.price[i],
+                    "Description Hash": part.desc[i],
+                }
+            )
+    return out
+
+
+def _last_observation(
+    root: str, months: List[str], pid: int
+) -> Optional[Tuple[int, int]]:
+    """(price, description hash) of the product's latest row in the first of
+    months (newest first) whose partition lists it."""
+
+    for month in months:
+        part = _partition(root, month)
+        if part is None:
+            continue
+        start, end = part.rows_of(pid)
+        if start < end:
+            return part.price[end - 1], part.desc[end - 1]
+    return None
+
+
+@metrics.timer("history.query")
+def restaurant_changes(
+    restaurant: str,
+    since: date,
+    until: Optional[date] = None,
+    root: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Price and description changes of one restaurant's products between
+    since and until (inclusive), ordered by date.
+
+    A change is an observation that differs from the product's previous
+    one; products first seen or no longer listed are not changes here.
+    """
+
+    root = root or HISTORY_DIR
+    if not os.path.isdir(root):
+        return []
+    dictionary = _read_dictionary(root)
+    pids = [pid for pid, key in enumerate(dictionary.keys) if key[0] == restaurant]
+
+    lo_day = since.toordinal()
+    hi_day = (until or date.today()).toordinal()
+
+    months = _months(since, until or date.today())
+    parts = [p for p in (_partition(root, m) for m in months) if p is not None]
+    # Older partitions, newest first: a product's first change is compared
+    # against its last observation, however many months back that was
+    earlier = sorted(
+        (f[:-4] for f in os.listdir(root) if f.endswith(".col") and f[:-4] < months[0]),
+        reverse=True,
+    )
+
+    changes: List[Dict[str, Any]] = []
+    for pid in pids:
+        previous: Optional[Tuple[int, int]] = None
+        for part in parts:
+            start, end = part.rows_of(pid)
+            end = bisect_right(part.day, hi_day, start, end)
+            for i in range(start, end):
+                current = (part.price[i], part.desc[i])
+                if previous is None and part.day[i] >= lo_day:
+                    previous = _last_observation(root, earlier, pid)
+                if (
+                    previous is not None
+                    and current != previous
+                    and part.day[i] >= lo_day
+                ):
+                    _, product_type, name = dictionary.keys[pid]
+                    changes.append(
+                        {
+                            COL_DATE: date.fromordinal(part.day[i]).isoformat(),
+                            COL_RESTAURANT: restaurant,
+                            COL_TYPE: product_type,
+                            COL_NAME: name,
+                            COL_OLD_PRICE: previous[0],
+                            COL_NEW_PRICE: current[0],
+                            "Description Changed": current[1] != previous[1],
+                        }
+                    )
+                previous = current
+
+    changes.sort(key=lambda c: (c[COL_DATE], c[COL_TYPE], c[COL_NAME]))
+    return changes
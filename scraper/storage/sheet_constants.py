@@ -14,6 +14,7 @@ COL_DATE = "Date"
 COL_RESTAURANT = "Restaurant"
 COL_TYPE = "Type"
 COL_NAME = "Name"
+COL_OLD_NAME = "Old Name"
 COL_DESCRIPTION = "Description"
 COL_PRICE = "Price"
 COL_NEW_PRICE = "New Price"
@@ -25,6 +26,8 @@ COL_COUNT = "Count"
 COL_AVERAGE = "Average"
 COL_LOWEST = "Lowest"
 COL_HIGHEST = "Highest"
+COL_MEDIAN = "Median"
+COL_P90 = "P90"
 
 PIZZA_HEADER = [
     COL_RESTAURANT,
@@ -61,4 +64,6 @@ AVERAGES_HEADER = [
     COL_AVERAGE,
     COL_LOWEST,
     COL_HIGHEST,
+    COL_MEDIAN,
+    COL_P90,
 ]
@@ -1,17 +1,22 @@
+import re
 import json
 import logging
 import os
 import gspread
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 from gspread import Spreadsheet, Worksheet
+from gspread.utils import a1_to_rowcol, absolute_range_name, fill_gaps, rowcol_to_a1
 from google.oauth2.service_account import Credentials
 from scraper.storage.sheet_constants import (
     PASTA_SHEET,
     PIZZA_SHEET,
     DIFFERENCES_SHEET,
     AVERAGES_SHEET,
+    PIZZA_HEADER,
+    PASTA_HEADER,
 )
 from functools import lru_cache
+from scraper import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +34,7 @@ def _init_workbook() -> Spreadsheet:
     )
     client = gspread.authorize(creds)
     wb = client.open_by_key(sheet_id)
+    metrics.incr("sheets.api_calls")
     logger.info("Google Sheet opened successfully")
     return wb
 
@@ -37,12 +43,19 @@ def get_workbook() -> Spreadsheet:
     return _init_workbook()
 
 
+@lru_cache(maxsize=None)
+def _get_ws(title: str) -> Worksheet:
+    # Each lookup is a metadata round-trip, so handles are cached per title
+    metrics.incr("sheets.api_calls")
+    return get_workbook().worksheet(title)
+
+
 def get_pizza_ws() -> Worksheet:
-    return get_workbook().worksheet(PIZZA_SHEET)
+    return _get_ws(PIZZA_SHEET)
 
 
 def get_pasta_ws() -> Worksheet:
-    return get_workbook().worksheet(PASTA_SHEET)
+    return _get_ws(PASTA_SHEET)
 
 
 def get_products_ws() -> List[Worksheet]:
@@ -50,30 +63,157 @@ def get_products_ws() -> List[Worksheet]:
 
 
 def get_differences_ws() -> Worksheet:
-    return get_workbook().worksheet(DIFFERENCES_SHEET)
+    return _get_ws(DIFFERENCES_SHEET)
 
 
 def get_averages_ws() -> Worksheet:
-    return get_workbook().worksheet(AVERAGES_SHEET)
+    return _get_ws(AVERAGES_SHEET)
 
 
-def get_product_records(
-    start_cell: str, end_cell: str, header_row: int = 2
-) -> List[Dict[str, Any]]:
+def get_worksheet(title: str) -> Worksheet:
+    return _get_ws(title)
 
-    cell_range = f"{start_cell}:{end_cell}"
-    combined_records: List[Dict[str, Any]] = []
 
+PRODUCT_SHEETS = [PIZZA_SHEET, PASTA_SHEET]
+PRODUCT_HEADERS = {PIZZA_SHEET: PIZZA_HEADER, PASTA_SHEET: PASTA_HEADER}
+
+# Rows per values.batchGet when reading product tabs in chunks
+READ_CHUNK_ROWS = int(os.getenv("SHEETS_READ_CHUNK_ROWS", 5000))
+
+
+def column_letter(col: int) -> str:
+    """1-based column number -> A1 column letters (1 -> A, 27 -> AA)."""
+
+    return re.sub(r"\d+", "", rowcol_to_a1(1, col))
+
+
+def _grid_rows(titles: List[str]) -> Dict[str, int]:
+    """Grid row count of each titled tab, from one spreadsheet metadata
+    request rather than one per worksheet."""
+
+    metadata = get_workbook().fetch_sheet_metadata(
+        params={"fields": "sheets.properties(title,gridProperties.rowCount)"}
+    )
+    metrics.incr("sheets.api_calls")
+    rows = {
+        sheet["properties"]["title"]: sheet["properties"]["gridProperties"]["rowCount"]
+        for sheet in metadata.get("sheets", [])
+    }
+    return {title: rows.get(title, 0) for title in titles}
+
+
+def _batch_get(ranges: List[str]) -> List[Dict[str, Any]]:
     try:
-        for ws in get_products_ws():
-            headers = ws.row_values(header_row)
-            values = ws.get_values(cell_range)
-            records = [dict(zip(headers, row)) for row in values if any(row)]
-            combined_records.extend(records)
-            logger.info(
-                f"Loaded {len(records)} products from '{ws.title}' in range {cell_range}"
-            )
-        return combined_records
+        response = get_workbook().values_batch_get(ranges)
+        metrics.incr("sheets.api_calls")
     except gspread.APIError:
         logger.error("Failed to fetch products from one of the sheets", exc_info=True)
         raise
+    return response.get("valueRanges", [])
+
+
+def _to_records(headers: List[str], values: List[List[Any]]) -> List[Dict[str, Any]]:
+    # Pad short rows with "" (trailing empty cells are not returned)
+    if values:
+        width = max(len(headers), max(len(row) for row in values))
+        values = fill_gaps(values, cols=width)
+    return [dict(zip(headers, row)) for row in values if any(row)]
+
+
+def iter_product_records(
+    start_cell: str, header_row: int = 2, chunk_rows: int = READ_CHUNK_ROWS
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the product rows of every product worksheet, chunk_rows at a time.
+
+    There is no end row: each tab is read down to its last grid row, one
+    values.batchGet per chunk covering all tabs that still have rows, so a
+    tab of any size is read without holding the whole response at once.
+    The tabs' sizes come from a single metadata request up front.
+    """
+
+    start_row, start_col = a1_to_rowcol(start_cell)
+    first_col = column_letter(start_col)
+    last_col = {
+        title: column_letter(start_col + len(header) - 1)
+        for title, header in PRODUCT_HEADERS.items()
+    }
+    grid_rows = _grid_rows(PRODUCT_SHEETS)
+
+    headers: Dict[str, List[str]] = {}
+    counts = {title: 0 for title in PRODUCT_SHEETS}
+    row = start_row
+
+    while True:
+        titles = [t for t in PRODUCT_SHEETS if row <= grid_rows[t]]
+        if not titles:
+            break
+
+        ranges: List[str] = []
+        for title in titles:
+            if title not in headers:
+                ranges.append(absolute_range_name(title, f"{header_row}:{header_row}"))
+            end_row = min(row + chunk_rows - 1, grid_rows[title])
+            ranges.append(
+                absolute_range_name(
+                    title, f"{first_col}{row}:{last_col[title]}{end_row}"
+                )
+            )
+
+        value_ranges = iter(_batch_get(ranges))
+        chunk: List[Dict[str, Any]] = []
+        for title in titles:
+            if title not in headers:
+                headers[title] = (next(value_ranges).get("values") or [[]])[0]
+            records = _to_records(
+                headers[title], next(value_ranges).get("values") or []
+            )
+            counts[title] += len(records)
+            chunk.extend(records)
+
+        metrics.incr("sheets.rows_read", len(chunk))
+        yield chunk
+        row += chunk_rows
+
+    for title, count in counts.items():
+        logger.info(f"Loaded {count} products from '{title}' from row {start_row}")
+
+
+@metrics.timer("sheets.read")
+def get_product_records(
+    start_cell: str, end_cell: Optional[str] = None, header_row: int = 2
+) -> List[Dict[str, Any]]:
+    """Read the header row and product rows of every product worksheet.
+
+    With an end_cell, the fixed range is read with a single values.batchGet
+    request. Without one, the tabs are read to the end in chunks (see
+    iter_product_records), so the number of products is not capped.
+    """
+
+    if end_cell is None:
+        combined_records: List[Dict[str, Any]] = []
+        for chunk in iter_product_records(start_cell, header_row):
+            combined_records.extend(chunk)
+        return combined_records
+
+    cell_range = f"{start_cell}:{end_cell}"
+    combined_records = []
+
+    ranges: List[str] = []
+    for title in PRODUCT_SHEETS:
+        ranges.append(absolute_range_name(title, f"{header_row}:{header_row}"))
+        ranges.append(absolute_range_name(title, cell_range))
+
+    value_ranges = _batch_get(ranges)
+
+    for i, title in enumerate(PRODUCT_SHEETS):
+        header_values = value_ranges[2 * i].get("values") or [[]]
+        values = value_ranges[2 * i + 1].get("values") or []
+
+        records = _to_records(header_values[0], values)
+        combined_records.extend(records)
+        metrics.incr("sheets.rows_read", len(records))
+        logger.info(
+            f"Loaded {len(records)} products from '{title}' in range {cell_range}"
+        )
+
+    return combined_records
@@ -1,98 +1,448 @@
+import os
+import time
+import random
 import logging
 import gspread
-from typing import Any, List, Dict
+from typing import Any, Callable, List, Dict, Optional, Tuple, TypeVar
 from datetime import date
+from gspread.utils import a1_to_rowcol, absolute_range_name, rowcol_to_a1
+from scraper import metrics
 from scraper.storage.sheet_constants import (
+    PIZZA_SHEET,
+    PASTA_SHEET,
+    DIFFERENCES_SHEET,
+    AVERAGES_SHEET,
     PIZZA_HEADER,
     PASTA_HEADER,
     DIFFERENCES_HEADER,
     AVERAGES_HEADER,
+    COL_RESTAURANT,
+    COL_TYPE,
+    COL_NAME,
+    COL_OLD_NAME,
+    COL_PRICE,
+    COL_DESCRIPTION,
+    COL_NEW_PRICE,
+    COL_NEW_DESCRIPTION,
+    COL_COMMENT,
 )
 from scraper.storage.sheets_reader import (
+    column_letter,
     get_pasta_ws,
     get_pizza_ws,
-    get_differences_ws,
-    get_averages_ws,
+    get_workbook,
+    get_worksheet,
 )
 
 logger = logging.getLogger(__name__)
 
+# Retries for quota (429) and transient server errors on each API request
+MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", 5))
+BACKOFF_BASE = float(os.getenv("SHEETS_BACKOFF_BASE", 1.0))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# A 5xx does not tell whether the request was applied, so requests that are
+# not safe to repeat (appends, row deletions) are only retried when the
+# quota rejected them
+QUOTA_STATUSES = (429,)
 
-def _clear_worksheet(ws, start_cell: str, end_cell: str) -> None:
-    """Clear only the rectangle from start_cell to end_cell (inclusive),"""
+T = TypeVar("T")
 
-    # build a single range string
-    cell_range = f"{start_cell}:{end_cell}"
 
-    try:
-        ws.batch_clear([cell_range])
-        logger.info("Cleared cells %s on '%s'", cell_range, ws.title)
-    except Exception as e:
-        logger.error("Failed to clear %s: %s", cell_range, e, exc_info=True)
-        raise
+def _with_retry(
+    call: Callable[[], T], what: str, statuses: Tuple[int, ...] = RETRY_STATUSES
+) -> T:
+    """Run one Sheets API request, backing off exponentially on the given
+    statuses (429/5xx by default)."""
 
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            with metrics.timer("sheets.write"):
+                result = call()
+            metrics.incr("sheets.api_calls")
+            return result
+        except gspread.exceptions.APIError as e:
+            status = getattr(e.response, "status_code", None)
+            if status not in statuses or attempt == MAX_RETRIES:
+                logger.error("%s failed: %s", what, e, exc_info=True)
+                raise
+            delay = BACKOFF_BASE * 2**attempt + random.uniform(0, BACKOFF_BASE)
+            metrics.incr("sheets.retries")
+            logger.warning(
+                "%s got HTTP %s, retrying in %.1fs (%d/%d)",
+                what,
+                status,
+                delay,
+                attempt + 1,
+                MAX_RETRIES,
+            )
+            time.sleep(delay)
 
-def _bulk_append(ws, records: List[List[Any]], start_cell) -> None:
-    """Use server‐side append to avoid reading the sheet and race conditions."""
 
-    try:
-        ws.append_rows(
-            records,
-            value_input_option="USER_ENTERED",
-            table_range=start_cell,
+class SheetsWriteBatch:
+    """Collects every write of a run and sends them together on flush().
+
+    All clears and value writes go out as a single values.batchUpdate;
+    clearing is done by writing "" over the rest of the cleared rectangle,
+    so clear + write of a tab is one range. Structural changes (row
+    deletions) follow as one spreadsheets.batchUpdate, so value writes
+    address rows as they were before the deletions. Appends (whose target
+    row the server decides) come last, one values.append each.
+
+    Open-ended replaces (no end cell) need two more requests, sent first
+    and only when used: one adding grid rows to tabs that are too short,
+    and one values.batchClear for whatever is left below the new rows.
+    """
+
+    def __init__(self) -> None:
+        self._data: List[Dict[str, Any]] = []
+        self._requests: List[Dict[str, Any]] = []
+        self._appends: List[Tuple[str, List[List[Any]]]] = []
+        self._clears: List[str] = []
+        self._grid_rows: Dict[str, int] = {}
+
+    def update(self, title: str, start_cell: str, rows: List[List[Any]]) -> None:
+        """Write rows starting at start_cell."""
+
+        self._data.append(
+            {"range": absolute_range_name(title, start_cell), "values": rows}
+        )
+
+    def replace(
+        self,
+        title: str,
+        start_cell: str,
+        end_cell: Optional[str],
+        rows: List[List[Any]],
+    ) -> None:
+        """Clear start_cell:end_cell and write rows at its top-left corner.
+
+        Without an end_cell the cleared area is every row from start_cell
+        down, as wide as the widest row, and the tab grows to fit the rows.
+        """
+
+        if end_cell is None:
+            self._replace_open_ended(title, start_cell, rows)
+            return
+
+        first_row, first_col = a1_to_rowcol(start_cell)
+        last_row, last_col = a1_to_rowcol(end_cell)
+        width = max([last_col - first_col + 1] + [len(row) for row in rows])
+        height = max(last_row - first_row + 1, len(rows))
+
+        padded = [list(row) + [""] * (width - len(row)) for row in rows]
+        padded.extend([[""] * width for _ in range(height - len(rows))])
+
+        self.update(title, start_cell, padded)
+
+    def _replace_open_ended(
+        self, title: str, start_cell: str, rows: List[List[Any]]
+    ) -> None:
+        first_row, first_col = a1_to_rowcol(start_cell)
+        width = max([1] + [len(row) for row in rows])
+        last_col = column_letter(first_col + width - 1)
+
+        if rows:
+            self.update(
+                title,
+                start_cell,
+                [list(row) + [""] * (width - len(row)) for row in rows],
+            )
+            needed = first_row + len(rows) - 1
+            self._grid_rows[title] = max(self._grid_rows.get(title, 0), needed)
+
+        below = first_row + len(rows)
+        self._clears.append(
+            absolute_range_name(title, f"{column_letter(first_col)}{below}:{last_col}")
         )
-        logger.info(f"Successfully appended {len(records)} rows to '{ws.title}'")
-    except Exception as e:
-        logger.error(f"Failed to append rows to '{ws.title}': {e}", exc_info=True)
-        raise
+
+    def delete_rows(self, sheet_id: int, rows: List[int]) -> None:
+        """Delete whole rows (1-based) of a worksheet, bottom-up so indexes hold."""
+
+        for row in sorted(set(rows), reverse=True):
+            self._requests.append(
+                {
+                    "deleteDimension": {
+                        "range": {
+                            "sheetId": sheet_id,
+                            "dimension": "ROWS",
+                            "startIndex": row - 1,
+                            "endIndex": row,
+                        }
+                    }
+                }
+            )
+
+    def append(self, title: str, start_cell: str, rows: List[List[Any]]) -> None:
+        """Append rows after the table that starts at start_cell."""
+
+        if rows:
+            self._appends.append((absolute_range_name(title, start_cell), rows))
+
+    def flush(self) -> None:
+        """Send everything collected so far; the batch is empty afterwards."""
+
+        wb = get_workbook()
+
+        grow = []
+        for title, needed in self._grid_rows.items():
+            ws = get_worksheet(title)
+            if needed > ws.row_count:
+                grow.append(
+                    {
+                        "appendDimension": {
+                            "sheetId": ws.id,
+                            "dimension": "ROWS",
+                            "length": needed - ws.row_count,
+                        }
+                    }
+                )
+        if grow:
+            body = {"requests": grow}
+            _with_retry(lambda: wb.batch_update(body), "spreadsheets.batchUpdate")
+            logger.info("Grew %d worksheets to fit the new rows", len(grow))
+
+        if self._clears:
+            body = {"ranges": self._clears}
+            _with_retry(lambda: wb.values_batch_clear(body=body), "values.batchClear")
+
+        if self._data:
+            body = {"valueInputOption": "USER_ENTERED", "data": self._data}
+            _with_retry(lambda: wb.values_batch_update(body), "values.batchUpdate")
+            logger.info("Wrote %d ranges in one batch update", len(self._data))
+
+        if self._requests:
+            body = {"requests": self._requests}
+            _with_retry(
+                lambda: wb.batch_update(body),
+                "spreadsheets.batchUpdate",
+                statuses=QUOTA_STATUSES,
+            )
+            logger.info("Applied %d structural changes", len(self._requests))
+
+        for range_name, rows in self._appends:
+            _with_retry(
+                lambda: wb.values_append(
+                    range_name,
+                    params={"valueInputOption": "USER_ENTERED"},
+                    body={"values": rows},
+                ),
+                f"values.append {range_name}",
+                statuses=QUOTA_STATUSES,
+            )
+            metrics.incr("sheets.rows_written", len(rows))
+            logger.info(f"Successfully appended {len(rows)} rows to {range_name}")
+
+        self._data = []
+        self._requests = []
+        self._appends = []
+        self._clears = []
+        self._grid_rows = {}
+
+
+def _write(batch: Optional[SheetsWriteBatch], fill: Callable[[SheetsWriteBatch], None]):
+    """Queue writes on the caller's batch, or send them right away if none."""
+
+    if batch is not None:
+        fill(batch)
+        return
+    own = SheetsWriteBatch()
+    fill(own)
+    own.flush()
 
 
 def bulk_append_products(
-    records: List[Dict[str, Any]], start_cell: str, end_cell: str
+    records: List[Dict[str, Any]],
+    start_cell: str,
+    end_cell: Optional[str] = None,
+    batch: Optional[SheetsWriteBatch] = None,
 ) -> None:
-    """Bulk‐append new product rows to the appropriate sheets based on Type."""
+    """Bulk‐append new product rows to the appropriate sheets based on Type.
 
-    pizza_ws = get_pizza_ws()
-    pasta_ws = get_pasta_ws()
+    Without an end_cell the tabs are rewritten from start_cell down, however
+    many products there are.
+    """
 
     pizza_records = [rec for rec in records if rec.get("Type", "").lower() == "pizza"]
     pasta_records = [rec for rec in records if rec.get("Type", "").lower() == "pasta"]
 
-    if pizza_records:
-        _clear_worksheet(pizza_ws, start_cell, end_cell)
-        pizza_rows = [
-            [rec.get(col, "") for col in PIZZA_HEADER] for rec in pizza_records
-        ]
-        _bulk_append(pizza_ws, pizza_rows, start_cell)
+    def fill(b: SheetsWriteBatch) -> None:
+        if pizza_records:
+            pizza_rows = [
+                [rec.get(col, "") for col in PIZZA_HEADER] for rec in pizza_records
+            ]
+            b.replace(PIZZA_SHEET, start_cell, end_cell, pizza_rows)
+            metrics.incr("sheets.rows_written", len(pizza_rows))
 
-    if pasta_records:
-        _clear_worksheet(pasta_ws, start_cell, end_cell)
-        pasta_rows = [
-            [rec.get(col, "") for col in PASTA_HEADER] for rec in pasta_records
-        ]
-        _bulk_append(pasta_ws, pasta_rows, start_cell)
+        if pasta_records:
+            pasta_rows = [
+                [rec.get(col, "") for col in PASTA_HEADER] for rec in pasta_records
+            ]
+            b.replace(PASTA_SHEET, start_cell, end_cell, pasta_rows)
+            metrics.incr("sheets.rows_written", len(pasta_rows))
 
+    _write(batch, fill)
 
-def bulk_append_differences(records: List[List[Any]], start_cell: str) -> None:
-    """Bulk‐append diff rows to DIFFERENCES_SHEET."""
 
-    ws = get_differences_ws()
+def _product_tabs() -> Dict[str, Tuple[str, List[str], Any]]:
+    """Product type -> (worksheet title, header, worksheet)."""
+
+    return {
+        "pizza": (PIZZA_SHEET, PIZZA_HEADER, get_pizza_ws()),
+        "pasta": (PASTA_SHEET, PASTA_HEADER, get_pasta_ws()),
+    }
+
+
+def _product_row_numbers(
+    tabs: Dict[str, Tuple[str, List[str], Any]], start_cell: str
+) -> Dict[str, Dict[Tuple[str, str, str], int]]:
+    """Sheet row of every (Restaurant, Type, Name) on each product tab, read
+    with one values.batchGet of the key columns only."""
+
+    start_row, start_col = a1_to_rowcol(start_cell)
+    ranges = []
+    for title, header, _ in tabs.values():
+        key_cols = [header.index(c) for c in (COL_RESTAURANT, COL_TYPE, COL_NAME)]
+        last_col = column_letter(start_col + max(key_cols))
+        ranges.append(absolute_range_name(title, f"{start_cell}:{last_col}"))
+
+    response = _with_retry(
+        lambda: get_workbook().values_batch_get(ranges), "values.batchGet"
+    )
+
+    row_numbers: Dict[str, Dict[Tuple[str, str, str], int]] = {}
+    for (title, header, _), value_range in zip(
+        tabs.values(), response.get("valueRanges", [])
+    ):
+        index = {}
+        for offset, row in enumerate(value_range.get("values", [])):
+            cells = dict(zip(header, row))
+            key = (
+                cells.get(COL_RESTAURANT, ""),
+                cells.get(COL_TYPE, ""),
+                cells.get(COL_NAME, ""),
+            )
+            if any(key):
+                index[key] = start_row + offset
+        row_numbers[title] = index
+    return row_numbers
+
+
+def apply_product_changes(
+    diff_records: List[Dict[str, Any]],
+    start_cell: str,
+    batch: Optional[SheetsWriteBatch] = None,
+) -> None:
+    """Bring the product tabs up to date from the comparator's change rows.
+
+    Only the cells of changed products are written, deleted products' rows
+    are removed and new products are appended, instead of clearing and
+    rewriting every tab.
+
+    Re-applying the same rows is safe: a run whose Sheets publish partly
+    failed keeps its snapshot uncommitted, so the next run sends them
+    again. A new product already on the tab is overwritten in place
+    rather than appended twice, and a rename already applied is found
+    under its new name.
+    """
+
+    tabs = _product_tabs()
+    start_col = a1_to_rowcol(start_cell)[1]
+    row_numbers = _product_row_numbers(tabs, start_cell)
+
+    def fill(b: SheetsWriteBatch) -> None:
+        new_rows: Dict[str, List[List[Any]]] = {}
+        deleted_rows: Dict[str, List[int]] = {}
+
+        for rec in diff_records:
+            tab = tabs.get(str(rec.get(COL_TYPE, "")).lower())
+            if tab is None:
+                continue
+            title, header, ws = tab
+            # A renamed product is still on the sheet under its old name
+            old_name = rec.get(COL_OLD_NAME)
+            key = (rec[COL_RESTAURANT], rec[COL_TYPE], old_name or rec[COL_NAME])
+            comment = rec.get(COL_COMMENT, "")
+
+            if comment == "New Product":
+                product = {
+                    COL_RESTAURANT: rec[COL_RESTAURANT],
+                    COL_TYPE: rec[COL_TYPE],
+                    COL_NAME: rec[COL_NAME],
+                    COL_PRICE: rec[COL_NEW_PRICE],
+                    COL_DESCRIPTION: rec[COL_NEW_DESCRIPTION],
+                }
+                values = [product.get(col, "") for col in header]
+                row = row_numbers[title].get(key)
+                if row is None:
+                    new_rows.setdefault(title, []).append(values)
+                else:
+                    b.update(title, rowcol_to_a1(row, start_col), [values])
+                    metrics.incr("sheets.cells_written", len(values))
+                continue
+
+            row = row_numbers[title].get(key)
+            if row is None and old_name:
+                key = (rec[COL_RESTAURANT], rec[COL_TYPE], rec[COL_NAME])
+                row = row_numbers[title].get(key)
+            if row is None:
+                logger.warning("No row on '%s' for %s, skipping", title, key)
+                continue
+
+            if comment == "Deleted Product":
+                deleted_rows.setdefault(title, []).append(row)
+                continue
+
+            if old_name:
+                cell = rowcol_to_a1(row, start_col + header.index(COL_NAME))
+                b.update(title, cell, [[rec[COL_NAME]]])
+                metrics.incr("sheets.cells_written")
+
+            for col, new_col in (
+                (COL_PRICE, COL_NEW_PRICE),
+                (COL_DESCRIPTION, COL_NEW_DESCRIPTION),
+            ):
+                if rec.get(new_col) is not None:
+                    cell = rowcol_to_a1(row, start_col + header.index(col))
+                    b.update(title, cell, [[rec[new_col]]])
+                    metrics.incr("sheets.cells_written")
+
+        for title, header, ws in tabs.values():
+            if title in deleted_rows:
+                b.delete_rows(ws.id, deleted_rows[title])
+            if title in new_rows:
+                b.append(title, start_cell, new_rows[title])
+
+    _write(batch, fill)
+
+
+def bulk_append_differences(
+    records: List[List[Any]],
+    start_cell: str,
+    batch: Optional[SheetsWriteBatch] = None,
+) -> None:
+    """Bulk‐append diff rows to DIFFERENCES_SHEET."""
 
     # Transform List[Dict] into List[List] in header order
     rows: List[List[Any]] = [
         [rec.get(col, "") for col in DIFFERENCES_HEADER] for rec in records
     ]
 
-    _bulk_append(ws, rows, start_cell)
+    _write(batch, lambda b: b.append(DIFFERENCES_SHEET, start_cell, rows))
 
 
 def bulk_replace_averages(
-    records: List[Dict[str, Any]], start_cell: str, end_cell: str
+    records: List[Dict[str, Any]],
+    start_cell: str,
+    end_cell: Optional[str] = None,
+    batch: Optional[SheetsWriteBatch] = None,
 ) -> None:
-    """Bulk‐append avg rows to AVERAGES_SHEET with a blank line separating pizza and pasta."""
+    """Bulk‐append avg rows to AVERAGES_SHEET with a blank line separating pizza and pasta.
 
-    ws = get_averages_ws()
-    _clear_worksheet(ws, start_cell, end_cell)
+    Without an end_cell everything below start_cell is replaced, so the
+    number of restaurants is not capped. The row above start_cell is the
+    header and is rewritten from AVERAGES_HEADER, so added columns get
+    their labels.
+    """
 
     rows: List[List[Any]] = []
     pasta_found = False
@@ -103,30 +453,28 @@ def bulk_replace_averages(
             pasta_found = True
         rows.append([rec.get(col, "") for col in AVERAGES_HEADER])
 
-    _bulk_append(ws, rows, start_cell)
+    first_row, first_col = a1_to_rowcol(start_cell)
+
+    def fill(b: SheetsWriteBatch) -> None:
+        if first_row > 1:
+            header_cell = rowcol_to_a1(first_row - 1, first_col)
+            b.update(AVERAGES_SHEET, header_cell, [AVERAGES_HEADER])
+        b.replace(AVERAGES_SHEET, start_cell, end_cell, rows)
+        metrics.incr("sheets.rows_written", len(rows))
 
+    _write(batch, fill)
 
-def set_execution_date(date_cell: str) -> None:
+
+def set_execution_date(
+    date_cell: str, batch: Optional[SheetsWriteBatch] = None
+) -> None:
     """Set execution date when the scraper ends"""
 
-    pizza_ws = get_pizza_ws()
-    pasta_ws = get_pasta_ws()
     today = date.today().isoformat()
 
-    try:
-        pizza_ws.update(
-            range_name=date_cell,
-            values=[[today]],
-            value_input_option="USER_ENTERED",
-        )
-
-        pasta_ws.update(
-            range_name=date_cell,
-            values=[[today]],
-            value_input_option="USER_ENTERED",
-        )
+    def fill(b: SheetsWriteBatch) -> None:
+        b.update(PIZZA_SHEET, date_cell, [[today]])
+        b.update(PASTA_SHEET, date_cell, [[today]])
 
-        logger.info(f"Set execution date to {today}")
-    except gspread.exceptions.APIError:
-        logger.error("Failed to set execution date", exc_info=True)
-        raise
+    _write(batch, fill)
+    logger.info(f"Set execution date to {today}")
@@ -0,0 +1,308 @@
+import os
+import json
+import sqlite3
+import logging
+from contextlib import closing, contextmanager
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from scraper import metrics
+from scraper.fsutil import CACHE_DIR
+from scraper.records import ProductRecord
+from scraper.stats import PriceStats
+from scraper.storage.sheet_constants import (
+    COL_RESTAURANT,
+    COL_TYPE,
+    COL_NAME,
+    COL_PRICE,
+    COL_DESCRIPTION,
+    COL_COUNT,
+    COL_AVERAGE,
+    COL_LOWEST,
+    COL_HIGHEST,
+    COL_MEDIAN,
+    COL_P90,
+)
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("SNAPSHOT_DB", os.path.join(CACHE_DIR, "snapshots.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    run_date     TEXT PRIMARY KEY,
+    created_at   TEXT NOT NULL,
+    record_count INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    run_date    TEXT NOT NULL REFERENCES snapshots(run_date) ON DELETE CASCADE,
+    restaurant  TEXT NOT NULL,
+    type        TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    price       INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    PRIMARY KEY (run_date, restaurant, type, name)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS products_by_identity
+    ON products (restaurant, type, name, run_date);
+
+CREATE INDEX IF NOT EXISTS products_by_run
+    ON products (run_date, position);
+
+CREATE TABLE IF NOT EXISTS type_stats (
+    run_date   TEXT NOT NULL REFERENCES snapshots(run_date) ON DELETE CASCADE,
+    restaurant TEXT NOT NULL,
+    type       TEXT NOT NULL,
+    count      INTEGER NOT NULL,
+    average    INTEGER NOT NULL,
+    lowest     INTEGER NOT NULL,
+    highest    INTEGER NOT NULL,
+    median     INTEGER NOT NULL,
+    p90        INTEGER NOT NULL,
+    prices     TEXT NOT NULL,  -- JSON price -> count, see PriceStats.to_dict
+    PRIMARY KEY (restaurant, type, run_date)
+) WITHOUT ROWID;
+"""
+
+
+def _open(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """Open the store, creating it on first use."""
+
+    path = db_path or DB_PATH
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+@contextmanager
+def _connect(db_path: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """Open the store for one transaction; commits on success."""
+
+    with closing(_open(db_path)) as conn:
+        with conn:
+            yield conn
+
+
+def _to_record(row: sqlite3.Row) -> ProductRecord:
+    return ProductRecord(
+        restaurant=row["restaurant"],
+        product_type=row["type"],
+        name=row["name"],
+        price=row["price"],
+        description=row["description"],
+    )
+
+
+@metrics.timer("snapshots.read")
+def latest_records(
+    before: Optional[str] = None, db_path: Optional[str] = None
+) -> Optional[List[ProductRecord]]:
+    """Products of the most recent snapshot (strictly before `before` if given).
+
+    Returns None when there is no snapshot yet, so callers can bootstrap
+    from another source.
+    """
+
+    with _connect(db_path) as conn:
+        if before is None:
+            found = conn.execute("SELECT MAX(run_date) AS d FROM snapshots").fetchone()
+        else:
+            found = conn.execute(
+                "SELECT MAX(run_date) AS d FROM snapshots WHERE run_date < ?",
+                (before,),
+            ).fetchone()
+        run_date = found["d"]
+        if run_date is None:
+            return None
+
+        # Site order, so change rows come out in the same order as before
+        rows = conn.execute(
+            "SELECT restaurant, type, name, price, description FROM products"
+            " WHERE run_date = ? ORDER BY position",
+            (run_date,),
+        )
+        records = [_to_record(row) for row in rows]
+
+    logger.info("Loaded %d products from snapshot %s", len(records), run_date)
+    return records
+
+
+class SnapshotWriter:
+    """Stores one run's snapshot batch by batch, e.g. one site at a time.
+
+    Everything is written inside one transaction: nothing is visible until
+    commit(), and discard(), or leaving a with block without committing,
+    drops it. Products are positioned in the order they were added.
+    Re-running on the same day replaces that day's snapshot.
+    """
+
+    def __init__(
+        self, run_date: Optional[str] = None, db_path: Optional[str] = None
+    ) -> None:
+        self.run_date = run_date or date.today().isoformat()
+        self._count = 0
+        self._conn: Optional[sqlite3.Connection] = _open(db_path)
+        self._conn.execute("DELETE FROM snapshots WHERE run_date = ?", (self.run_date,))
+        self._conn.execute(
+            "INSERT INTO snapshots (run_date, created_at, record_count) VALUES (?, ?, 0)",
+            (self.run_date, datetime.now(timezone.utc).isoformat()),
+        )
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.discard()
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        rows = [
+            (
+                self.run_date,
+                rec[COL_RESTAURANT],
+                rec[COL_TYPE],
+                rec[COL_NAME],
+                int(rec[COL_PRICE]),
+                (rec[COL_DESCRIPTION] or "").strip(),
+                position,
+            )
+            for position, rec in enumerate(records, start=self._count)
+        ]
+        # Later duplicates win, as in the comparator's key maps
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO products"
+            " (run_date, restaurant, type, name, price, description, position)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._count += len(rows)
+
+    def add_type_stats(
+        self,
+        rows: List[Dict[str, Any]],
+        distributions: Dict[str, Dict[str, Dict[str, int]]],
+    ) -> None:
+        """Store the run's per (restaurant, type) statistics with it.
+
+        rows are TypeAverages.rows(), distributions TypeAverages.to_dict().
+        """
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO type_stats (run_date, restaurant, type, count,"
+            " average, lowest, highest, median, p90, prices)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    self.run_date,
+                    row[COL_RESTAURANT],
+                    row[COL_TYPE],
+                    row[COL_COUNT],
+                    row[COL_AVERAGE],
+                    row[COL_LOWEST],
+                    row[COL_HIGHEST],
+                    row[COL_MEDIAN],
+                    row[COL_P90],
+                    json.dumps(distributions[row[COL_RESTAURANT]][row[COL_TYPE]]),
+                )
+                for row in rows
+            ],
+        )
+
+    def commit(self) -> None:
+        self._conn.execute(
+            "UPDATE snapshots SET record_count = ? WHERE run_date = ?",
+            (self._count, self.run_date),
+        )
+        self._conn.commit()
+        self._close()
+        logger.info("Saved snapshot %s with %d products", self.run_date, self._count)
+
+    def discard(self) -> None:
+        """Drop the snapshot unless it was committed."""
+
+        if self._conn is not None:
+            self._conn.rollback()
+            self._close()
+
+    def _close(self) -> None:
+        self._conn.close()
+        self._conn = None
+
+
+@metrics.timer("snapshots.write")
+def save_snapshot(
+    records: List[Dict[str, Any]],
+    run_date: Optional[str] = None,
+    db_path: Optional[str] = None,
+) -> None:
+    """Store records as the snapshot of run_date (today by default).
+
+    Re-running on the same day replaces that day's snapshot.
+    """
+
+    with SnapshotWriter(run_date, db_path) as writer:
+        writer.add(records)
+        writer.commit()
+
+
+def product_history(
+    restaurant: str, product_type: str, name: str, db_path: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Price and description of one product in every snapshot, oldest first."""
+
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT run_date, price, description FROM products"
+            " WHERE restaurant = ? AND type = ? AND name = ?"
+            " ORDER BY run_date",
+            (restaurant, product_type, name),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def type_stats_history(
+    restaurant: str,
+    product_type: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    db_path: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Per-run statistics of one (restaurant, type), oldest first."""
+
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT run_date, count, average, lowest, highest, median, p90"
+            " FROM type_stats WHERE restaurant = ? AND type = ?"
+            " AND run_date >= ? AND run_date <= ? ORDER BY run_date",
+            (restaurant, product_type, since or "", until or "9999"),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def type_price_stats(
+    restaurant: str,
+    product_type: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    db_path: Optional[str] = None,
+) -> PriceStats:
+    """The stored price distributions of every run in [since, until] merged,
+    e.g. for a monthly average or median without reading any products."""
+
+    merged = PriceStats()
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT prices FROM type_stats WHERE restaurant = ? AND type = ?"
+            " AND run_date >= ? AND run_date <= ?",
+            (restaurant, product_type, since or "", until or "9999"),
+        )
+        for row in rows:
+            merged.merge(PriceStats.from_dict(json.loads(row["prices"])))
+    return merged
@@ -1,35 +1,132 @@
 import os
+import gzip
+import json
+import logging
 import requests
-from datetime import datetime
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from dotenv import load_dotenv
+from scraper import metrics
+from scraper.sites.http_client import default_timeout, pooled_session
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_KEY = os.environ["SUPABASE_KEY"]
+TABLE = "products"
+CONFLICT_KEY = "restaurant,product_type,product_name,fetched_at"
 
-def insert_products(items: list[dict], restaurant: str, product_type: str):
-    url = f"{SUPABASE_URL}/rest/v1/products"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "return=representation"
-    }
+# Rows per upsert request
+CHUNK_ROWS = int(os.getenv("SUPABASE_CHUNK_ROWS", 500))
 
-    payload = []
+# Compress request bodies; the server (or a proxy in front of PostgREST)
+# must accept Content-Encoding: gzip
+GZIP_BODIES = os.getenv("SUPABASE_GZIP", "0") == "1"
+
+MAX_RETRIES = int(os.getenv("SUPABASE_MAX_RETRIES", 5))
+BACKOFF_FACTOR = float(os.getenv("SUPABASE_BACKOFF_FACTOR", 0.5))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+@lru_cache(maxsize=1)
+def _config() -> Tuple[str, Optional[str]]:
+    """(REST base URL, API key), read on first use rather than on import.
+
+    SUPABASE_REST_URL points the writer at any PostgREST, e.g. a local one
+    for testing, which needs no key; otherwise SUPABASE_URL and
+    SUPABASE_KEY are required.
+    """
+
+    load_dotenv()
+    key = os.getenv("SUPABASE_KEY")
+    rest_url = os.getenv("SUPABASE_REST_URL")
+    if rest_url:
+        return rest_url.rstrip("/"), key
+
+    url = os.getenv("SUPABASE_URL")
+    if not url or not key:
+        raise RuntimeError("Missing SUPABASE_URL or SUPABASE_KEY")
+    return f"{url.rstrip('/')}/rest/v1", key
+
+
+@lru_cache(maxsize=1)
+def _init_session() -> requests.Session:
+    _, key = _config()
+    # Upserts on the conflict key are idempotent, so POST is safe to repeat
+    session = pooled_session(
+        frozenset({"GET", "POST"}),
+        retries=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        backoff_jitter=0,
+    )
+
+    session.headers["Content-Type"] = "application/json"
+    if key:
+        session.headers["apikey"] = key
+        session.headers["Authorization"] = f"Bearer {key}"
+    return session
+
+
+def _post_chunk(rows: List[Dict[str, Any]]) -> None:
+    base_url, _ = _config()
+    body = json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode()
+    headers = {"Prefer": "resolution=merge-duplicates,return=minimal"}
+    if GZIP_BODIES:
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+
+    with metrics.timer("supabase.write"):
+        response = _init_session().post(
+            f"{base_url}/{TABLE}",
+            params={"on_conflict": CONFLICT_KEY},
+            data=body,
+            headers=headers,
+            timeout=default_timeout(),
+        )
+    metrics.incr("supabase.api_calls")
+    metrics.incr("supabase.bytes_sent", len(body))
+    if not response.ok:
+        logger.error("Supabase upsert failed: %s", response.text)
+    response.raise_for_status()
+
+
+def upsert_products(
+    items: Iterable[Dict[str, Any]],
+    restaurant: str,
+    product_type: str,
+    fetched_at: Optional[date] = None,
+) -> int:
+    """Upsert one restaurant's products of one type for fetched_at (today,
+    UTC, by default), in chunks of CHUNK_ROWS.
+
+    Rows are keyed on (restaurant, product_type, product_name, fetched_at),
+    so re-sending a day overwrites it instead of duplicating it; a name
+    repeated within items keeps its last row. Returns the number of rows
+    sent.
+    """
+
+    day = (fetched_at or datetime.now(timezone.utc).date()).isoformat()
+
+    by_name: Dict[str, Dict[str, Any]] = {}
     for item in items:
-        payload.append({
+        by_name[item["product_name"]] = {
             "restaurant": restaurant,
             "product_type": product_type,
             "product_name": item["product_name"],
             "price": item["price"],
             "description": item["description"],
-            "fetched_at": datetime.utcnow().date().isoformat()
-        })
+            "fetched_at": day,
+        }
+    rows = list(by_name.values())
 
-    response = requests.post(url, json=payload, headers=headers)
-    if not response.ok:
-        print("Failed to insert:", response.text)
-    else:
-        print(f"Inserted {len(payload)} items successfully.")
+    for start in range(0, len(rows), CHUNK_ROWS):
+        _post_chunk(rows[start : start + CHUNK_ROWS])
+
+    metrics.incr("supabase.rows", len(rows))
+    logger.info(
+        "Upserted %d %s products of %s for %s", len(rows), product_type, restaurant, day
+    )
+    return len(rows)
+
+
+# Former name, kept for existing callers
+insert_products = upsert_products
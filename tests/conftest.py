@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.fixture
+def make_record():
+    """Factory for product records as the parsers and the sheet produce them."""
+
+    def make(name, price, description="paradicsom", restaurant="Etna", type_="pizza"):
+        return {
+            "Restaurant": restaurant,
+            "Type": type_,
+            "Name": name,
+            "Price": price,
+            "Description": description,
+        }
+
+    return make
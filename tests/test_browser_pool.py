@@ -0,0 +1,260 @@
+import asyncio
+import threading
+
+import pytest
+
+from scraper.sites import browser_pool
+from scraper.sites.browser_pool import BrowserPool, capture_responses
+
+
+class FakeResponse:
+    def __init__(self, url, body="", status=200):
+        self.url = url
+        self.status = status
+        self._body = body
+
+    async def text(self):
+        return self._body
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type="document"):
+        self.url = url
+        self.resource_type = resource_type
+
+
+class FakeRoute:
+    def __init__(self, request):
+        self.request = request
+        self.outcome = None
+
+    async def abort(self):
+        self.outcome = "aborted"
+
+    async def continue_(self):
+        self.outcome = "continued"
+
+
+class FakePage:
+    """Emits `responses` on navigation; then either raises `error`, finishes,
+    or (hang=True) never finishes, like a page that keeps loading."""
+
+    def __init__(self, responses=(), error=None, hang=False):
+        self.responses = responses
+        self.error = error
+        self.hang = hang
+        self.handlers = {}
+        self.routes = []
+        self.closed = False
+
+    async def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def goto(self, url, wait_until, timeout):
+        for response in self.responses:
+            await self.handlers["response"](response)
+        if self.error is not None:
+            raise self.error
+        if self.hang:
+            await asyncio.Event().wait()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, page=None):
+        self.page = page or FakePage()
+        self.closed = False
+
+    async def new_page(self):
+        return self.page
+
+    async def close(self):
+        self.closed = True
+
+
+def _capture(page, patterns, **kwargs):
+    kwargs.setdefault("timeout", 1)
+    return asyncio.run(
+        capture_responses(FakeContext(page), "https://x.test/menu", patterns, **kwargs)
+    )
+
+
+def test_returns_first_matching_response_without_waiting_for_the_page():
+    page = FakePage(
+        [
+            FakeResponse("https://x.test/api/menu/TAKEAWAY/", "{}", status=500),
+            FakeResponse("https://x.test/api/menu/TAKEAWAY/", "not json"),
+            FakeResponse("https://x.test/api/menu/TAKEAWAY/", '{"menu": 1}'),
+            FakeResponse("https://x.test/api/menu/TAKEAWAY/", '{"menu": 2}'),
+        ],
+        hang=True,
+    )
+
+    captured = _capture(page, ["/menu/TAKEAWAY/"], accept=lambda b: b.startswith("{"))
+
+    assert captured["/menu/TAKEAWAY/"].body == '{"menu": 1}'
+    assert page.closed
+
+
+def test_times_out_naming_the_missing_patterns():
+    page = FakePage([FakeResponse("https://x.test/api/menu", "{}")])
+
+    with pytest.raises(TimeoutError, match="/prices/"):
+        _capture(page, ["/api/menu", "/prices/"], timeout=0.1)
+    assert page.closed
+
+
+def test_deadline_covers_a_page_that_never_finishes():
+    page = FakePage(hang=True)
+
+    with pytest.raises(TimeoutError):
+        _capture(page, ["/api/menu"], timeout=0.1)
+    assert page.closed
+
+
+def test_failed_navigation_is_raised():
+    page = FakePage(error=RuntimeError("net::ERR_NAME_NOT_RESOLVED"))
+
+    with pytest.raises(RuntimeError, match="ERR_NAME_NOT_RESOLVED"):
+        _capture(page, ["/api/menu"])
+    assert page.closed
+
+
+@pytest.mark.parametrize(
+    "request_, outcome",
+    [
+        (FakeRequest("https://x.test/logo.png", "image"), "aborted"),
+        (FakeRequest("https://x.test/style.css", "stylesheet"), "aborted"),
+        (FakeRequest("https://www.googletagmanager.com/gtm.js", "script"), "aborted"),
+        (FakeRequest("https://x.test/app.js", "script"), "continued"),
+        (FakeRequest("https://x.test/api/menu", "fetch"), "continued"),
+    ],
+)
+def test_unneeded_requests_are_blocked(request_, outcome):
+    route = FakeRoute(request_)
+
+    asyncio.run(browser_pool._block_unneeded(route))
+
+    assert route.outcome == outcome
+
+
+def test_capture_routes_every_request_through_the_blocker():
+    page = FakePage([FakeResponse("https://x.test/api/menu", "{}")])
+
+    _capture(page, ["/api/menu"])
+
+    assert page.routes == [("**/*", browser_pool._block_unneeded)]
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self):
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.browsers = []
+        self.stopped = False
+        self.firefox = self
+
+    async def launch(self, headless):
+        self.browsers.append(FakeBrowser())
+        return self.browsers[-1]
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def playwright(mocker):
+    fake = FakePlaywright()
+    mocker.patch.object(browser_pool, "async_playwright", lambda: fake)
+    return fake
+
+
+@pytest.fixture
+def pool(playwright):
+    pool = BrowserPool("firefox", max_contexts=2, context_max_uses=3)
+    yield pool
+    pool.close()
+
+
+async def _context_of(context):
+    return context
+
+
+def test_contexts_are_reused_then_recycled(pool, playwright):
+    used = [pool.run(_context_of) for _ in range(4)]
+
+    assert used[0] is used[1] is used[2]
+    assert used[0].closed
+    assert used[3] is not used[0] and not used[3].closed
+    assert len(playwright.browsers) == 1
+
+
+def test_failed_use_discards_the_context(pool):
+    async def fail(context):
+        fail.context = context
+        raise ValueError("page crashed")
+
+    with pytest.raises(ValueError):
+        pool.run(fail)
+
+    assert fail.context.closed
+    assert pool.run(_context_of) is not fail.context
+
+
+def test_at_most_max_contexts_are_in_use(pool):
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    async def use(context):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        with lock:
+            active -= 1
+
+    threads = [threading.Thread(target=pool.run, args=(use,)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert peak == 2
+
+
+def test_close_releases_everything_and_pool_restarts(pool, playwright):
+    context = pool.run(_context_of)
+    browser = playwright.browsers[0]
+
+    pool.close()
+
+    assert context.closed and browser.closed and playwright.stopped
+    assert not pool._thread.is_alive()
+
+    # Usable again afterwards, on a fresh loop and browser
+    assert pool.run(_context_of) is not context
+    assert len(playwright.browsers) == 2
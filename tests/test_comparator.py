@@ -0,0 +1,124 @@
+import random
+
+import pytest
+
+from scraper import identity
+from scraper.comparator import ProductDiffer, get_product_changes
+from scraper.records import ProductRecord
+
+
+def _summary(changes):
+    return [(c["Name"], c["Comment"], c["New Price"]) for c in changes]
+
+
+def test_reports_new_changed_and_deleted_products(make_record):
+    sheet = [
+        make_record("Margherita", 2400),
+        make_record("Sonkás", 2800),
+        make_record("Tonno", 3000),
+    ]
+    site = [
+        make_record("Margherita", 2500),
+        make_record("Sonkás", 2800, "paradicsom, sonka"),
+        make_record("Bolognai", 2950),
+    ]
+
+    assert _summary(get_product_changes(site, sheet)) == [
+        ("Margherita", "Price Changed", 2500),
+        ("Sonkás", "Description Changed", None),
+        ("Bolognai", "New Product", 2950),
+        ("Tonno", "Deleted Product", None),
+    ]
+
+
+def test_unchanged_inventory_has_no_changes(make_record):
+    records = [make_record("Margherita", 2400), make_record("Sonkás", 2800)]
+
+    assert get_product_changes(records, [dict(r) for r in records]) == []
+
+
+def test_normalised_values_are_not_changes(make_record):
+    sheet = [make_record("Margherita", "2400", "paradicsom ")]
+
+    assert (
+        get_product_changes([make_record("Margherita", 2400, "paradicsom")], sheet)
+        == []
+    )
+
+
+def test_records_and_dicts_compare_alike(make_record):
+    sheet = [make_record("Margherita", 2400), make_record("Tonno", 3000)]
+    site = [make_record("Margherita", 2500), make_record("Bolognai", 2950)]
+
+    assert get_product_changes(
+        [ProductRecord.from_dict(r) for r in site],
+        [ProductRecord.from_dict(r) for r in sheet],
+    ) == get_product_changes(site, sheet)
+
+
+def test_repeated_key_keeps_first_position_and_last_record(make_record):
+    sheet = [make_record("Margherita", 2400), make_record("Sonkás", 2800)]
+    site = [
+        make_record("Margherita", 2500),
+        make_record("Sonkás", 2900),
+        make_record("Margherita", 2400),
+    ]
+
+    assert _summary(get_product_changes(site, sheet)) == [
+        ("Sonkás", "Price Changed", 2900)
+    ]
+
+
+def test_out_of_order_batches_keep_the_last_record(make_record):
+    # One key in batches 0, 1 and 2, added in the order 2, 0, 1
+    differ = ProductDiffer([make_record("Margherita", 100)])
+    differ.add([make_record("Margherita", 300)], batch=2)
+    differ.add([make_record("Margherita", 100)], batch=0)
+    differ.add([make_record("Margherita", 200)], batch=1)
+
+    assert _summary(differ.changes()) == [("Margherita", "Price Changed", 300)]
+
+
+def _reference(site, sheet):
+    """The comparison without renames, written as plainly as possible: the
+    last record of a key wins, rows are ordered by its first occurrence."""
+
+    key = lambda r: (r["Restaurant"], r["Type"], r["Name"])
+    sheet_map = {key(r): r for r in sheet}
+    site_map = {key(r): r for r in site}
+    rows = []
+    for k, r in site_map.items():
+        old = sheet_map.get(k)
+        if old is None:
+            rows.append((k[2], "New Product", r["Price"]))
+        elif int(old["Price"]) != int(r["Price"]):
+            rows.append((k[2], "Price Changed", r["Price"]))
+    rows.extend((k[2], "Deleted Product", None) for k in sheet_map if k not in site_map)
+    return rows
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_batches_in_any_order_match_the_plain_comparison(seed, mocker, make_record):
+    mocker.patch.object(identity, "RENAME_THRESHOLD", 2)
+    rng = random.Random(seed)
+    names = [f"Pizza {i}" for i in range(6)]
+
+    sheet = [make_record(n, rng.choice([100, 200])) for n in rng.sample(names, 4)]
+    batches = [
+        [
+            make_record(rng.choice(names), rng.choice([100, 200, 300]))
+            for _ in range(rng.randint(0, 4))
+        ]
+        for _ in range(rng.randint(1, 4))
+    ]
+    site = [r for batch in batches for r in batch]
+
+    differ = ProductDiffer(sheet)
+    order = list(range(len(batches)))
+    rng.shuffle(order)
+    for index in order:
+        differ.add(batches[index], batch=index)
+
+    expected = _reference(site, sheet)
+    assert _summary(differ.changes()) == expected
+    assert _summary(get_product_changes(site, sheet)) == expected
@@ -0,0 +1,45 @@
+import os
+
+from scraper.sites.fingerprint import fingerprint, normalise
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "volatile_page.html")
+
+
+def page(token="a1b2", version="6.4.2", nonce="n0nce", time="09:00:01", price=2990):
+    """The fixture page as served on one request."""
+
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read().format(
+            token=token, version=version, nonce=nonce, time=time, price=price
+        )
+
+
+def test_volatile_tokens_are_stripped():
+    text = normalise(page())
+
+    for token in ("a1b2", "6.4.2", "n0nce", "09:00:01"):
+        assert token not in text
+    assert "Margherita" in text and "2990 Ft" in text
+
+
+def test_volatile_tokens_do_not_change_the_fingerprint():
+    assert fingerprint(page()) == fingerprint(
+        page(token="zz99", version="6.5.0", nonce="other", time="21:13:59")
+    )
+
+
+def test_whitespace_does_not_change_the_fingerprint():
+    assert fingerprint(page()) == fingerprint(page().replace("\n", "\n\n    "))
+
+
+def test_content_changes_change_the_fingerprint():
+    assert fingerprint(page()) != fingerprint(page(price=3190))
+
+
+def test_site_patterns_extend_the_defaults():
+    body = page() + '<div id="visitors">1234</div>'
+    other = page() + '<div id="visitors">1240</div>'
+    pattern = [r'<div id="visitors">\d+</div>']
+
+    assert fingerprint(body) != fingerprint(other)
+    assert fingerprint(body, pattern) == fingerprint(other, pattern)
@@ -0,0 +1,108 @@
+from datetime import date
+
+from scraper.storage import history
+
+
+def test_price_history_across_months(tmp_path, make_record):
+    root = str(tmp_path)
+    history.record_day([make_record("Margherita", 2400)], date(2026, 1, 31), root)
+    history.record_day([make_record("Margherita", 2500)], date(2026, 2, 1), root)
+    history.record_day([make_record("Sonkás", 2800)], date(2026, 2, 2), root)
+
+    rows = history.price_history(
+        "Etna", "pizza", "Margherita", until=date(2026, 2, 28), root=root
+    )
+
+    assert [(r["Date"], r["Price"]) for r in rows] == [
+        ("2026-01-31", 2400),
+        ("2026-02-01", 2500),
+    ]
+
+
+def test_price_history_date_range(tmp_path, make_record):
+    root = str(tmp_path)
+    for day in (1, 2, 3):
+        history.record_day(
+            [make_record("Margherita", 2400 + day)], date(2026, 3, day), root
+        )
+
+    rows = history.price_history(
+        "Etna", "pizza", "Margherita", date(2026, 3, 2), date(2026, 3, 2), root
+    )
+
+    assert [r["Price"] for r in rows] == [2402]
+
+
+def test_rerecording_a_day_replaces_it(tmp_path, make_record):
+    root = str(tmp_path)
+    day = date(2026, 3, 1)
+    history.record_day([make_record("Margherita", 2400)], day, root)
+    history.record_day([make_record("Margherita", 2600)], day, root)
+
+    rows = history.price_history("Etna", "pizza", "Margherita", until=day, root=root)
+
+    assert [r["Price"] for r in rows] == [2600]
+
+
+def test_unknown_product_has_no_history(tmp_path):
+    assert (
+        history.price_history("Etna", "pizza", "Margherita", root=str(tmp_path)) == []
+    )
+
+
+def test_restaurant_changes(tmp_path, make_record):
+    root = str(tmp_path)
+    history.record_day(
+        [make_record("Margherita", 2400), make_record("Sonkás", 2800)],
+        date(2026, 3, 31),
+        root,
+    )
+    history.record_day(
+        [make_record("Margherita", 2500), make_record("Sonkás", 2800, "sonka, gomba")],
+        date(2026, 4, 1),
+        root,
+    )
+    history.record_day(
+        [
+            make_record("Margherita", 2500),
+            make_record("Diavola", 3100, restaurant="Bellozzo"),
+        ],
+        date(2026, 4, 2),
+        root,
+    )
+
+    changes = history.restaurant_changes(
+        "Etna", date(2026, 4, 1), date(2026, 4, 30), root
+    )
+
+    assert [
+        (c["Date"], c["Name"], c["Old Price"], c["New Price"], c["Description Changed"])
+        for c in changes
+    ] == [
+        ("2026-04-01", "Margherita", 2400, 2500, False),
+        ("2026-04-01", "Sonkás", 2800, 2800, True),
+    ]
+
+
+def test_restaurant_changes_compare_against_older_months(tmp_path, make_record):
+    root = str(tmp_path)
+    history.record_day(
+        [make_record("Margherita", 2400), make_record("Sonkás", 2800)],
+        date(2025, 12, 20),
+        root,
+    )
+    history.record_day([make_record("Sonkás", 2900)], date(2026, 2, 10), root)
+    history.record_day(
+        [make_record("Margherita", 2600), make_record("Sonkás", 2900)],
+        date(2026, 4, 3),
+        root,
+    )
+
+    changes = history.restaurant_changes(
+        "Etna", date(2026, 4, 1), date(2026, 4, 30), root
+    )
+
+    # Margherita was last seen in December, Sonkás in February
+    assert [(c["Name"], c["Old Price"], c["New Price"]) for c in changes] == [
+        ("Margherita", 2400, 2600)
+    ]
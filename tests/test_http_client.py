@@ -0,0 +1,66 @@
+import requests
+
+from scraper import metrics
+from scraper.sites import http_client
+
+
+def test_retry_policy():
+    retry = http_client.retry_policy(frozenset({"GET", "HEAD"}))
+
+    assert set(retry.status_forcelist) == {429, 500, 502, 503, 504}
+    assert retry.allowed_methods == frozenset({"GET", "HEAD"})
+    assert retry.total == http_client.MAX_RETRIES
+    assert retry.backoff_factor == http_client.BACKOFF_FACTOR
+    assert retry.backoff_jitter == http_client.BACKOFF_JITTER
+    assert retry.respect_retry_after_header
+    assert not retry.raise_on_status
+
+
+def test_retry_policy_overrides():
+    retry = http_client.retry_policy(
+        frozenset({"POST"}), retries=7, backoff_factor=0, backoff_jitter=0
+    )
+
+    assert retry.allowed_methods == frozenset({"POST"})
+    assert (retry.total, retry.connect, retry.read, retry.status) == (7, 7, 7, 7)
+    assert retry.backoff_factor == 0
+    assert retry.backoff_jitter == 0
+
+
+def test_session_is_shared_and_pooled():
+    session = http_client.get_session()
+
+    assert http_client.get_session() is session
+    for scheme in ("https://", "http://"):
+        adapter = session.get_adapter(scheme + "example.com")
+        assert adapter.max_retries.status_forcelist == http_client.RETRY_STATUSES
+        assert adapter._pool_maxsize == http_client.POOL_MAXSIZE
+    assert "gzip" in session.headers["accept-encoding"]
+
+
+def _response(status, body=b""):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    return response
+
+
+def test_get_records_bytes_and_latency(mocker):
+    session = mocker.Mock()
+    session.get.side_effect = [_response(200, b"x" * 100), _response(304)]
+    mocker.patch.object(http_client, "get_session", return_value=session)
+    metrics.reset()
+
+    http_client.get("https://example.com/menu")
+    http_client.get("https://example.com/menu", timeout=1)
+
+    data = metrics.summary()
+    assert data["counters"] == {
+        "http.requests": 2,
+        "http.bytes_fetched": 100,
+        "http.not_modified": 1,
+    }
+    assert data["timers"]["http.get"]["count"] == 2
+    first, second = session.get.call_args_list
+    assert first.kwargs["timeout"] == http_client.default_timeout()
+    assert second.kwargs["timeout"] == 1
@@ -0,0 +1,51 @@
+from scraper.comparator import get_product_changes
+from scraper.identity import match_renames, normalise_name
+
+
+def _key(name, restaurant="Etna", type_="pizza"):
+    return (restaurant, type_, name)
+
+
+def test_normalise_name():
+    assert normalise_name("Margheríta-Pizza") == "margherita pizza"
+    assert normalise_name("  MARGHERITA   pizza ") == "margherita pizza"
+
+
+def test_matches_spelling_and_spacing_changes():
+    new = [_key("Prosciutto Funghi"), _key("Quattro  Formaggi")]
+    deleted = [_key("quattro formaggi"), _key("Prosciuto e Funghi")]
+
+    assert match_renames(new, deleted) == {0: 1, 1: 0}
+
+
+def test_different_numbers_are_different_products():
+    assert match_renames([_key("Pizza 12")], [_key("Pizza 13")]) == {}
+
+
+def test_only_same_restaurant_and_type_are_compared():
+    new = [_key("Carbonara", type_="pasta"), _key("Carbonara", restaurant="Bellozzo")]
+
+    assert match_renames(new, [_key("Carbonara")]) == {}
+
+
+def test_each_product_is_matched_once_best_first():
+    new = [_key("Margherita pizza"), _key("Margherita")]
+
+    assert match_renames(new, [_key("margherita")]) == {1: 0}
+
+
+def test_renamed_product_is_one_change_row():
+    record = {"Restaurant": "Etna", "Type": "pizza", "Price": 2400, "Description": "x"}
+
+    changes = get_product_changes(
+        [{**record, "Name": "Sonkás-gombás", "Price": 2500}],
+        [{**record, "Name": "Sonkás gombás"}],
+    )
+
+    assert [(c["Name"], c["Old Name"], c["Comment"]) for c in changes] == [
+        (
+            "Sonkás-gombás",
+            "Sonkás gombás",
+            "Renamed from 'Sonkás gombás' & Price Changed",
+        )
+    ]
@@ -0,0 +1,58 @@
+import pytest
+
+from scraper import main
+from scraper.sinks import SinkError
+from scraper.storage import history, snapshots
+
+
+@pytest.fixture
+def run(mocker, tmp_path, make_record):
+    """Run main._run on a fixed previous and current inventory."""
+
+    mocker.patch.object(snapshots, "DB_PATH", str(tmp_path / "snapshots.sqlite3"))
+    mocker.patch.object(history, "HISTORY_DIR", str(tmp_path / "history"))
+    mocker.patch.object(
+        main,
+        "get_product_records",
+        return_value=[make_record("Margherita", 2400), make_record("Sonkás", 2800)],
+    )
+    mocker.patch.object(
+        main,
+        "iter_site_records",
+        return_value=iter(
+            [(0, {}, [make_record("Margherita", 2500), make_record("Sonkás", 2800)])]
+        ),
+    )
+    mocker.patch.object(main, "_send_email")
+    return mocker.patch.object(main, "_publish_to_sheets")
+
+
+def test_snapshot_is_committed_after_sheets_publish(run):
+    main._run()
+
+    records = snapshots.latest_records()
+    assert [(r.name, r.price) for r in records] == [
+        ("Margherita", 2500),
+        ("Sonkás", 2800),
+    ]
+    assert run.call_count == 1
+
+
+def test_failed_sheets_publish_keeps_previous_reference(run):
+    run.side_effect = RuntimeError("Sheets unavailable")
+
+    with pytest.raises(SinkError) as failed:
+        main._run()
+
+    assert list(failed.value.failures) == ["sheets"]
+    assert snapshots.latest_records() is None
+    assert history.price_history("Etna", "pizza", "Margherita") == []
+
+
+def test_failed_email_still_commits_snapshot(run, mocker):
+    main._send_email.side_effect = ValueError("bad template")
+
+    with pytest.raises(SinkError):
+        main._run()
+
+    assert snapshots.latest_records() is not None
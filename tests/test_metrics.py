@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from scraper import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _one_timer_and_counter(mocker):
+    mocker.patch.object(metrics.time, "perf_counter", side_effect=[10.0, 10.25])
+    with metrics.timer("parse.etna_pizza"):
+        pass
+    metrics.incr("http.bytes_fetched", 2048)
+
+
+def test_prometheus_exposition(mocker):
+    _one_timer_and_counter(mocker)
+
+    assert metrics.to_prometheus() == (
+        "# TYPE scraper_stage_seconds_total counter\n"
+        'scraper_stage_seconds_total{stage="parse.etna_pizza"} 0.25\n'
+        "# TYPE scraper_stage_calls_total counter\n"
+        'scraper_stage_calls_total{stage="parse.etna_pizza"} 1\n'
+        "# TYPE scraper_http_bytes_fetched_total counter\n"
+        "scraper_http_bytes_fetched_total 2048\n"
+    )
+
+
+def test_write_summary(mocker, tmp_path):
+    _one_timer_and_counter(mocker)
+    json_path, prom_path = tmp_path / "run.json", tmp_path / "run.prom"
+
+    metrics.write_summary(str(json_path), str(prom_path))
+
+    assert json.loads(json_path.read_text()) == {
+        "timers": {"parse.etna_pizza": {"count": 1, "total_s": 0.25, "max_s": 0.25}},
+        "counters": {"http.bytes_fetched": 2048},
+    }
+    assert prom_path.read_text() == metrics.to_prometheus()
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from scraper.parsers import html_backend
+from scraper.sites.sites import SITES
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Fixture per site: (file, [(name, price), ...] expected from it)
+EXPECTED = {
+    "bellozzo_pizza": (
+        "bellozzo_pizza.html",
+        [
+            ("Margherita", 2990),
+            ("Prosciutto e funghi", 3490),
+            ("Quattro formaggi", 3790),
+            # Boxes with a second class, in either order
+            ("Diavola", 3590),
+            ("Capricciosa", 3690),
+        ],
+    ),
+    "etna_pizza": (
+        "etna_pizza.html",
+        [("Margherita", 2400), ("Sonkás gombás", 2800), ("Bolognai", 2950)],
+    ),
+    "etna_pasta": (
+        "etna_pasta.html",
+        [("Bolognai", 2450), ("Carbonara", 2690), ("Quattro formaggi", 2790)],
+    ),
+    "donnamamma_pizza": (
+        "donnamamma_pizza.html",
+        [("Margherita", 2990), ("Diavola", 3490)],
+    ),
+    "pizzahut_pizza": (
+        "pizzahut_pizza.json",
+        [("Margherita", 2990), ("Pepperoni", 3590), ("Bolognese", 2790)],
+    ),
+}
+
+HTML_SITES = [s for s in SITES if s["id"] in EXPECTED and not s.get("needs_playwright")]
+
+
+def _load(site):
+    with open(os.path.join(FIXTURES, EXPECTED[site["id"]][0]), encoding="utf-8") as f:
+        return f.read()
+
+
+def _meta(site, **overrides):
+    meta = {
+        "restaurant": site["restaurant"],
+        "product_type": site["product_type"],
+        "html_backend": site.get("html_backend"),
+        "scope": site.get("scope"),
+    }
+    meta.update(overrides)
+    return meta
+
+
+@pytest.mark.parametrize(
+    "site", [s for s in SITES if s["id"] in EXPECTED], ids=lambda s: s["id"]
+)
+def test_parser_reads_fixture(site):
+    records = site["parser"](_load(site), _meta(site))
+
+    assert [(r.name, r.price) for r in records] == EXPECTED[site["id"]][1]
+    assert all(r.restaurant == site["restaurant"] for r in records)
+
+
+@pytest.mark.parametrize(
+    "backend", [b for b in html_backend.BACKENDS if b != "html.parser"]
+)
+@pytest.mark.parametrize("site", HTML_SITES, ids=lambda s: s["id"])
+def test_backends_produce_identical_records(site, backend):
+    if not html_backend._available(backend):
+        pytest.skip(f"{backend} is not installed")
+
+    differences = html_backend.check_parity(
+        site["parser"], _load(site), _meta(site), backends=[backend]
+    )
+
+    assert differences == {backend: []}
+
+
+@pytest.mark.parametrize("site", HTML_SITES, ids=lambda s: s["id"])
+def test_scope_does_not_change_records(site):
+    html = _load(site)
+
+    scoped = site["parser"](html, _meta(site))
+    unscoped = site["parser"](html, _meta(site, scope=None))
+
+    assert scoped == unscoped
@@ -0,0 +1,61 @@
+import pytest
+
+from scraper.storage import sheets_reader
+
+HEADER = ["Restaurant", "Type", "Name", "Price", "Description"]
+
+
+def _sheet(title, rows):
+    return {"properties": {"title": title, "gridProperties": {"rowCount": rows}}}
+
+
+@pytest.fixture
+def workbook(mocker):
+    wb = mocker.MagicMock()
+    wb.fetch_sheet_metadata.return_value = {
+        "sheets": [
+            _sheet("Pizza", 6),
+            _sheet("Pasta", 3),
+            _sheet("Differences", 1000),
+        ]
+    }
+    mocker.patch.object(sheets_reader, "get_workbook", return_value=wb)
+    ws = mocker.patch.object(sheets_reader, "_get_ws")
+    return wb, ws
+
+
+def test_chunks_are_sized_from_one_metadata_request(workbook):
+    wb, ws = workbook
+    pizza = [["Etna", "pizza", f"P{i}", 2000 + i, "x"] for i in range(4)]
+    pasta = [["Etna", "pasta", "Carbonara", 2790, "tojás"]]
+    wb.values_batch_get.side_effect = [
+        {
+            "valueRanges": [
+                {"values": [HEADER]},
+                {"values": pizza[:2]},
+                {"values": [HEADER]},
+                {"values": pasta},
+            ]
+        },
+        {"valueRanges": [{"values": pizza[2:]}]},
+    ]
+
+    chunks = list(sheets_reader.iter_product_records("A3", chunk_rows=2))
+
+    assert [[r["Name"] for r in chunk] for chunk in chunks] == [
+        ["P0", "P1", "Carbonara"],
+        ["P2", "P3"],
+    ]
+    wb.fetch_sheet_metadata.assert_called_once()
+    ws.assert_not_called()
+    first, second = (c.args[0] for c in wb.values_batch_get.call_args_list)
+    assert first == ["'Pizza'!2:2", "'Pizza'!A3:E4", "'Pasta'!2:2", "'Pasta'!A3:E3"]
+    assert second == ["'Pizza'!A5:E6"]
+
+
+def test_missing_tab_is_read_as_empty(workbook):
+    wb, _ = workbook
+    wb.fetch_sheet_metadata.return_value = {"sheets": [_sheet("Pizza", 2)]}
+
+    assert list(sheets_reader.iter_product_records("A3")) == []
+    wb.values_batch_get.assert_not_called()
@@ -0,0 +1,326 @@
+import gspread
+import pytest
+import requests
+
+from scraper.storage import sheets_writer
+from scraper.storage.sheets_writer import SheetsWriteBatch
+
+
+def _api_error(status):
+    response = requests.Response()
+    response.status_code = status
+    response._content = b'{"error": {"code": %d, "message": "x"}}' % status
+    return gspread.exceptions.APIError(response)
+
+
+@pytest.fixture
+def workbook(mocker):
+    mocker.patch.object(sheets_writer, "BACKOFF_BASE", 0)
+    wb = mocker.MagicMock()
+    mocker.patch.object(sheets_writer, "get_workbook", return_value=wb)
+    return wb
+
+
+def test_flush_sends_values_then_deletions_then_appends(workbook):
+    batch = SheetsWriteBatch()
+    batch.append("Differences", "A2", [["a"]])
+    batch.delete_rows(7, [3, 5])
+    batch.update("Pizza", "A3", [["x", 1]])
+
+    batch.flush()
+
+    calls = [name for name, _, _ in workbook.method_calls]
+    assert calls == ["values_batch_update", "batch_update", "values_append"]
+
+    deletions = workbook.batch_update.call_args.args[0]["requests"]
+    assert [d["deleteDimension"]["range"]["startIndex"] for d in deletions] == [4, 2]
+
+
+def test_flush_empties_the_batch(workbook):
+    batch = SheetsWriteBatch()
+    batch.update("Pizza", "A3", [["x"]])
+    batch.flush()
+    batch.flush()
+
+    assert workbook.values_batch_update.call_count == 1
+
+
+def test_value_writes_are_retried_on_server_errors(workbook):
+    workbook.values_batch_update.side_effect = [_api_error(503), None]
+    batch = SheetsWriteBatch()
+    batch.update("Pizza", "A3", [["x"]])
+
+    batch.flush()
+
+    assert workbook.values_batch_update.call_count == 2
+
+
+def test_appends_are_retried_on_quota_errors(workbook):
+    workbook.values_append.side_effect = [_api_error(429), None]
+    batch = SheetsWriteBatch()
+    batch.append("Differences", "A2", [["a"]])
+
+    batch.flush()
+
+    assert workbook.values_append.call_count == 2
+
+
+def test_appends_are_not_repeated_on_server_errors(workbook):
+    # The append may have been applied; repeating it would duplicate rows
+    workbook.values_append.side_effect = [_api_error(500), None]
+    batch = SheetsWriteBatch()
+    batch.append("Differences", "A2", [["a"]])
+
+    with pytest.raises(gspread.exceptions.APIError):
+        batch.flush()
+
+    assert workbook.values_append.call_count == 1
+
+
+def test_row_deletions_are_not_repeated_on_server_errors(workbook):
+    workbook.batch_update.side_effect = [_api_error(502), None]
+    batch = SheetsWriteBatch()
+    batch.delete_rows(7, [3])
+
+    with pytest.raises(gspread.exceptions.APIError):
+        batch.flush()
+
+    assert workbook.batch_update.call_count == 1
+
+
+def test_averages_rewrite_their_header_row(workbook):
+    batch = SheetsWriteBatch()
+    rows = [{"Restaurant": "Etna", "Type": "pizza", "Median": 2800, "P90": 3100}]
+
+    sheets_writer.bulk_replace_averages(rows, "A5", "H20", batch=batch)
+    batch.flush()
+
+    data = workbook.values_batch_update.call_args.args[0]["data"]
+    assert data[0] == {
+        "range": f"'{sheets_writer.AVERAGES_SHEET}'!A4",
+        "values": [sheets_writer.AVERAGES_HEADER],
+    }
+    assert data[1]["values"][0][-2:] == [2800, 3100]
+
+
+@pytest.fixture
+def worksheets(mocker):
+    """Product tabs of a fake spreadsheet, by title, with 10-row grids."""
+
+    tabs = {
+        "Pizza": mocker.Mock(id=11, row_count=10),
+        "Pasta": mocker.Mock(id=12, row_count=10),
+    }
+    mocker.patch.object(sheets_writer, "get_worksheet", side_effect=tabs.__getitem__)
+    return tabs
+
+
+def test_open_ended_replace_grows_the_grid_first(workbook, worksheets):
+    batch = SheetsWriteBatch()
+    batch.replace("Pizza", "A3", None, [["x", 1]] * 12)
+    batch.replace("Pasta", "A3", None, [["y", 2]] * 5)
+
+    batch.flush()
+
+    calls = [name for name, _, _ in workbook.method_calls]
+    assert calls == ["batch_update", "values_batch_clear", "values_batch_update"]
+    # Rows 3-14 need 14 rows on Pizza; Pasta's 10 are enough
+    assert workbook.batch_update.call_args.args[0] == {
+        "requests": [
+            {"appendDimension": {"sheetId": 11, "dimension": "ROWS", "length": 4}}
+        ]
+    }
+
+
+def test_open_ended_replace_clears_below_the_written_block(workbook, worksheets):
+    batch = SheetsWriteBatch()
+    batch.replace("Pizza", "B3", None, [["x", 1, "a"], ["y", 2]])
+
+    batch.flush()
+
+    workbook.batch_update.assert_not_called()
+    assert workbook.values_batch_clear.call_args.kwargs["body"] == {
+        "ranges": ["'Pizza'!B5:D"]
+    }
+    data = workbook.values_batch_update.call_args.args[0]["data"]
+    assert data == [{"range": "'Pizza'!B3", "values": [["x", 1, "a"], ["y", 2, ""]]}]
+
+
+def test_open_ended_replace_with_no_rows_clears_everything(workbook, worksheets):
+    batch = SheetsWriteBatch()
+    batch.replace("Pizza", "A3", None, [])
+
+    batch.flush()
+
+    assert workbook.values_batch_clear.call_args.kwargs["body"] == {
+        "ranges": ["'Pizza'!A3:A"]
+    }
+    workbook.values_batch_update.assert_not_called()
+    workbook.batch_update.assert_not_called()
+
+
+# Product tabs as the batchGet of their key columns returns them, from A3
+PIZZA_ROWS = [
+    ["Etna", "pizza", "Margherita"],
+    ["Etna", "pizza", "Sonkás"],
+    ["Etna", "pizza", "Tonno"],
+    ["Etna", "pizza", "Diavola"],
+    ["Etna", "pizza", "Bolognai"],
+]
+PASTA_ROWS = [["Etna", "pasta", "Carbonara"]]
+
+
+@pytest.fixture
+def product_tabs(mocker, workbook):
+    mocker.patch.object(sheets_writer, "get_pizza_ws", return_value=mocker.Mock(id=11))
+    mocker.patch.object(sheets_writer, "get_pasta_ws", return_value=mocker.Mock(id=12))
+    workbook.values_batch_get.return_value = {
+        "valueRanges": [{"values": PIZZA_ROWS}, {"values": PASTA_ROWS}]
+    }
+    return workbook
+
+
+def _change(name, comment, type_="pizza", **values):
+    row = {
+        "Date": "2026-10-18",
+        "Restaurant": "Etna",
+        "Type": type_,
+        "Name": name,
+        "Old Price": None,
+        "New Price": None,
+        "Old Description": None,
+        "New Description": None,
+        "Comment": comment,
+    }
+    row.update(values)
+    return row
+
+
+def _apply(changes):
+    batch = SheetsWriteBatch()
+    sheets_writer.apply_product_changes(changes, "A3", batch=batch)
+    batch.flush()
+
+
+def _written(workbook):
+    if not workbook.values_batch_update.called:
+        return {}
+    data = workbook.values_batch_update.call_args.args[0]["data"]
+    return {d["range"]: d["values"] for d in data}
+
+
+def test_changed_products_write_only_their_cells(product_tabs):
+    _apply(
+        [
+            _change("Margherita", "Price Changed", **{"New Price": 2500}),
+            _change("Sonkás", "Description Changed", **{"New Description": "sonka"}),
+            _change("Carbonara", "Price Changed", "pasta", **{"New Price": 2790}),
+        ]
+    )
+
+    assert _written(product_tabs) == {
+        "'Pizza'!D3": [[2500]],
+        "'Pizza'!E4": [["sonka"]],
+        "'Pasta'!D3": [[2790]],
+    }
+    product_tabs.values_append.assert_not_called()
+
+
+def test_renamed_product_rewrites_its_name(product_tabs):
+    rename = _change(
+        "Sonkás-gombás",
+        "Renamed from 'Sonkás' & Price Changed",
+        **{"Old Name": "Sonkás", "New Price": 2900},
+    )
+
+    _apply([rename])
+
+    assert _written(product_tabs) == {
+        "'Pizza'!C4": [["Sonkás-gombás"]],
+        "'Pizza'!D4": [[2900]],
+    }
+
+
+def test_rename_already_on_the_sheet_is_found_under_its_new_name(product_tabs):
+    rename = _change(
+        "Diavola",
+        "Renamed from 'Diavolo' & Price Changed",
+        **{"Old Name": "Diavolo", "New Price": 3100},
+    )
+
+    _apply([rename])
+
+    assert _written(product_tabs) == {
+        "'Pizza'!C6": [["Diavola"]],
+        "'Pizza'!D6": [[3100]],
+    }
+
+
+def test_deleted_products_are_removed_bottom_up(product_tabs):
+    _apply(
+        [
+            _change("Sonkás", "Deleted Product"),
+            _change("Bolognai", "Deleted Product"),
+            _change("Carbonara", "Deleted Product", "pasta"),
+        ]
+    )
+
+    requests = product_tabs.batch_update.call_args.args[0]["requests"]
+    assert [
+        (
+            r["deleteDimension"]["range"]["sheetId"],
+            r["deleteDimension"]["range"]["startIndex"],
+        )
+        for r in requests
+    ] == [(11, 6), (11, 3), (12, 2)]
+
+
+def test_new_products_are_appended(product_tabs):
+    _apply(
+        [
+            _change(
+                "Capricciosa",
+                "New Product",
+                **{"New Price": 3390, "New Description": "sonka, gomba"},
+            )
+        ]
+    )
+
+    product_tabs.values_append.assert_called_once()
+    call = product_tabs.values_append.call_args
+    assert call.args[0] == "'Pizza'!A3"
+    assert call.kwargs["body"] == {
+        "values": [["Etna", "pizza", "Capricciosa", 3390, "sonka, gomba"]]
+    }
+
+
+def test_new_product_already_on_the_sheet_is_not_appended_again(product_tabs):
+    # A previous run appended it but failed later, so its snapshot was kept
+    _apply(
+        [
+            _change(
+                "Tonno",
+                "New Product",
+                **{"New Price": 3000, "New Description": "tonhal"},
+            )
+        ]
+    )
+
+    product_tabs.values_append.assert_not_called()
+    assert _written(product_tabs) == {
+        "'Pizza'!A5": [["Etna", "pizza", "Tonno", 3000, "tonhal"]]
+    }
+
+
+def test_rows_not_on_the_sheet_are_skipped(product_tabs):
+    _apply(
+        [
+            _change("Quattro formaggi", "Price Changed", **{"New Price": 3500}),
+            _change("Quattro formaggi", "Deleted Product"),
+            _change("Sprite", "Price Changed", "drink", **{"New Price": 600}),
+        ]
+    )
+
+    assert _written(product_tabs) == {}
+    product_tabs.batch_update.assert_not_called()
+    product_tabs.values_append.assert_not_called()
@@ -0,0 +1,61 @@
+import smtplib
+import threading
+
+import pytest
+
+from scraper import sinks
+from scraper.sinks import Sink, SinkError, publish_all
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(mocker):
+    mocker.patch.object(sinks, "BACKOFF_BASE", 0)
+
+
+def test_sinks_run_concurrently():
+    # Each sink waits for the other: run one after the other, both time out
+    barrier = threading.Barrier(2, timeout=5)
+
+    publish_all([Sink("a", barrier.wait), Sink("b", barrier.wait)])
+
+
+def test_failure_does_not_stop_other_sinks():
+    published = []
+
+    def fail():
+        raise RuntimeError("down")
+
+    with pytest.raises(SinkError) as failed:
+        publish_all([Sink("sheets", fail), Sink("email", lambda: published.append(1))])
+
+    assert published == [1]
+    assert list(failed.value.failures) == ["sheets"]
+
+
+def test_retries_only_listed_errors():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise smtplib.SMTPServerDisconnected("bye")
+
+    publish_all([Sink("email", flaky, retries=2, retry_on=(smtplib.SMTPException,))])
+    assert len(calls) == 3
+
+    calls.clear()
+    with pytest.raises(SinkError):
+        publish_all([Sink("email", flaky, retries=2, retry_on=(ValueError,))])
+    assert len(calls) == 1
+
+
+def test_gives_up_after_retries():
+    calls = []
+
+    def down():
+        calls.append(1)
+        raise OSError("unreachable")
+
+    with pytest.raises(SinkError):
+        publish_all([Sink("email", down, retries=2, retry_on=(OSError,))])
+    assert len(calls) == 3
@@ -0,0 +1,345 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+import requests
+
+from scraper.parsers import bellozzo
+from scraper.sites import browser_pool, response_cache, site_fetcher
+from scraper.sites.sites import SITES
+
+
+@pytest.fixture
+def cache_dir(mocker, tmp_path):
+    """Response cache in a temporary directory."""
+
+    mocker.patch.object(response_cache, "CACHE_DIR", str(tmp_path))
+    mocker.patch.object(response_cache, "CACHE_ENABLED", True)
+    return tmp_path
+
+
+def _parse_names(html, meta):
+    return [
+        {
+            "Restaurant": meta["restaurant"],
+            "Type": meta["product_type"],
+            "Name": name,
+            "Price": 2400,
+            "Description": "",
+        }
+        for name in html.split(",")
+    ]
+
+
+def _stub_site(site_id, host):
+    return {
+        "id": site_id,
+        "restaurant": site_id,
+        "product_type": "pizza",
+        "url": f"https://{host}/{site_id}",
+        "parser": _parse_names,
+    }
+
+
+def _bellozzo_site(**overrides):
+    site = dict(next(s for s in SITES if s["id"] == "bellozzo_pizza"))
+    site.update(overrides)
+    return site
+
+
+def test_records_owner_is_stable():
+    assert site_fetcher._records_owner(_bellozzo_site()) == site_fetcher._records_owner(
+        _bellozzo_site()
+    )
+
+
+def test_records_owner_changes_with_parser_options():
+    owner = site_fetcher._records_owner(_bellozzo_site())
+
+    assert site_fetcher._records_owner(_bellozzo_site(scope=None)) != owner
+    assert site_fetcher._records_owner(_bellozzo_site(html_backend="lxml")) != owner
+
+
+@pytest.mark.parametrize(
+    "edit", [{"restaurant": "Bellozzo Kft."}, {"product_type": "pasta"}]
+)
+def test_records_owner_changes_with_site_metadata(edit):
+    owner = site_fetcher._records_owner(_bellozzo_site())
+
+    assert site_fetcher._records_owner(_bellozzo_site(**edit)) != owner
+
+
+def test_records_owner_covers_everything_the_parser_is_given():
+    site = _bellozzo_site()
+    meta = site_fetcher._parser_meta(site)
+
+    for key in meta:
+        changed = _bellozzo_site(**{key: "changed"})
+        assert site_fetcher._records_owner(changed) != site_fetcher._records_owner(
+            site
+        ), key
+
+
+def test_records_owner_changes_with_parser_source(mocker):
+    owner = site_fetcher._records_owner(_bellozzo_site())
+
+    real_hash = site_fetcher._source_hash
+    mocker.patch.object(
+        site_fetcher,
+        "_source_hash",
+        lambda module: "edited" if module == bellozzo.__name__ else real_hash(module),
+    )
+
+    assert site_fetcher._records_owner(_bellozzo_site()) != owner
+
+
+def test_concurrency_per_host_is_limited_and_order_kept(mocker, cache_dir):
+    sites = [_stub_site(f"s{i}", f"host{i % 2}.test") for i in range(8)]
+    mocker.patch.object(site_fetcher, "SITES", sites)
+    mocker.patch.object(site_fetcher, "MAX_WORKERS", 8)
+    mocker.patch.object(site_fetcher, "MAX_PER_HOST", 2)
+    mocker.patch.dict(site_fetcher._host_slots, clear=True)
+
+    lock = threading.Lock()
+    active, peak = Counter(), Counter()
+
+    def fetch(site):
+        host = site["url"].split("/")[2]
+        with lock:
+            active[host] += 1
+            peak[host] = max(peak[host], active[host])
+        # Later sites finish first
+        time.sleep(0.05 - 0.005 * int(site["id"][1:]))
+        with lock:
+            active[host] -= 1
+        return f"{site['id']} a,{site['id']} b", None
+
+    mocker.patch.object(site_fetcher, "_fetch_html", fetch)
+
+    records = site_fetcher.get_site_records()
+
+    assert peak == {"host0.test": 2, "host1.test": 2}
+    assert [r.name for r in records] == [
+        f"s{i} {n}" for i in range(8) for n in ("a", "b")
+    ]
+
+
+def test_pending_sites_are_cancelled_when_iteration_stops(mocker, cache_dir):
+    sites = [_stub_site(f"s{i}", f"host{i}.test") for i in range(3)]
+    mocker.patch.object(site_fetcher, "SITES", sites)
+    mocker.patch.object(site_fetcher, "MAX_WORKERS", 1)
+    fetched = []
+
+    def fetch(site):
+        fetched.append(site["id"])
+        if site["id"] == "s1":
+            # Still running when the caller stops; s2 waits in the queue
+            time.sleep(0.2)
+        return "x", None
+
+    mocker.patch.object(site_fetcher, "_fetch_html", fetch)
+
+    records = site_fetcher.iter_site_records()
+    index, _, _ = next(records)
+    records.close()
+
+    # s1 may or may not have started by then, s2 never does
+    assert index == 0
+    assert fetched[0] == "s0"
+    assert "s2" not in fetched
+
+
+def test_failing_site_cancels_the_rest(mocker, cache_dir):
+    sites = [_stub_site(f"s{i}", f"host{i}.test") for i in range(3)]
+    mocker.patch.object(site_fetcher, "SITES", sites)
+    mocker.patch.object(site_fetcher, "MAX_WORKERS", 1)
+    fetched = []
+
+    def fetch(site):
+        fetched.append(site["id"])
+        if site["id"] == "s0":
+            raise RuntimeError("site down")
+        time.sleep(0.2)
+        return "x", None
+
+    mocker.patch.object(site_fetcher, "_fetch_html", fetch)
+
+    with pytest.raises(RuntimeError):
+        site_fetcher.get_site_records()
+
+    assert "s2" not in fetched
+
+
+def _http_response(status, body="", headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body.encode("utf-8")
+    response.encoding = "utf-8"
+    response.headers.update(headers or {})
+    return response
+
+
+@pytest.fixture
+def counted_parser():
+    def parse(html, meta):
+        parse.call_count += 1
+        return _parse_names(html, meta)
+
+    parse.call_count = 0
+    return parse
+
+
+def _menu(names, nonce="n1"):
+    return f'<script nonce="{nonce}"></script>{names}'
+
+
+def test_not_modified_page_reuses_cached_records(mocker, cache_dir, counted_parser):
+    site = {**_stub_site("s0", "host0.test"), "parser": counted_parser}
+    get = mocker.patch.object(
+        site_fetcher.http_client,
+        "get",
+        side_effect=[
+            _http_response(200, "Margherita,Diavola", {"ETag": '"v1"'}),
+            _http_response(304),
+        ],
+    )
+
+    first = site_fetcher._get_records_for_site(site)
+    second = site_fetcher._get_records_for_site(site)
+
+    assert second == first
+    assert counted_parser.call_count == 1
+    assert get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+
+def test_unchanged_content_reuses_cached_records(mocker, cache_dir, counted_parser):
+    # The body differs only in a nonce: a 200, but the same menu
+    site = {**_stub_site("s0", "host0.test"), "parser": counted_parser}
+    mocker.patch.object(
+        site_fetcher.http_client,
+        "get",
+        side_effect=[
+            _http_response(200, _menu("Margherita", nonce="n1")),
+            _http_response(200, _menu("Margherita", nonce="n2")),
+        ],
+    )
+
+    site_fetcher._get_records_for_site(site)
+    site_fetcher._get_records_for_site(site)
+
+    assert counted_parser.call_count == 1
+
+
+def test_changed_content_is_parsed_again(mocker, cache_dir, counted_parser):
+    site = {**_stub_site("s0", "host0.test"), "parser": counted_parser}
+    mocker.patch.object(
+        site_fetcher.http_client,
+        "get",
+        side_effect=[
+            _http_response(200, _menu("Margherita")),
+            _http_response(200, _menu("Margherita,Diavola")),
+        ],
+    )
+
+    site_fetcher._get_records_for_site(site)
+    records = site_fetcher._get_records_for_site(site)
+
+    assert counted_parser.call_count == 2
+    assert [r.name for r in records][-1] == "Diavola"
+
+
+MENU_JSON = '{"menu": {"categories": []}}'
+
+
+def _api_site(**overrides):
+    site = {
+        "id": "hut",
+        "restaurant": "Pizza Hut",
+        "product_type": "both",
+        "url": "https://hut.test/menu",
+        "needs_playwright": True,
+        "capture": {"patterns": ["/menu/TAKEAWAY/"]},
+        "payload_check": lambda body: body.startswith('{"menu"'),
+        "parser": _parse_names,
+    }
+    site.update(overrides)
+    return site
+
+
+@pytest.fixture
+def browser(mocker):
+    pool = mocker.Mock()
+    pool.capture.return_value = {
+        "/menu/TAKEAWAY/": browser_pool.Captured(
+            "https://api.hut.test/menu/TAKEAWAY/1", MENU_JSON
+        )
+    }
+    mocker.patch.object(site_fetcher, "get_pool", return_value=pool)
+    return pool
+
+
+def test_declared_json_url_is_called_directly(mocker, cache_dir, browser):
+    get = mocker.patch.object(
+        site_fetcher.http_client, "get", return_value=_http_response(200, MENU_JSON)
+    )
+    site = _api_site(json_url="https://api.hut.test/menu.json")
+
+    body, _ = site_fetcher._fetch_api_payload(site)
+
+    assert body == MENU_JSON
+    assert get.call_args.args == ("https://api.hut.test/menu.json",)
+    browser.capture.assert_not_called()
+
+
+def test_capture_remembers_the_source_for_the_next_run(mocker, cache_dir, browser):
+    get = mocker.patch.object(
+        site_fetcher.http_client, "get", return_value=_http_response(200, MENU_JSON)
+    )
+
+    # First run: nothing known yet, so the browser captures the endpoint
+    body, _ = site_fetcher._fetch_api_payload(_api_site())
+    assert body == MENU_JSON
+    assert browser.capture.call_count == 1
+    get.assert_not_called()
+
+    # Next run: the captured endpoint is called without the browser
+    body, _ = site_fetcher._fetch_api_payload(_api_site())
+    assert body == MENU_JSON
+    assert get.call_args.args == ("https://api.hut.test/menu/TAKEAWAY/1",)
+    assert browser.capture.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "response",
+    [_http_response(500, "oops"), _http_response(200, "<html>login</html>")],
+    ids=["http-error", "wrong-shape"],
+)
+def test_bad_json_fetch_falls_back_to_the_browser(mocker, cache_dir, browser, response):
+    response_cache.store_response(
+        "https://hut.test/menu",
+        MENU_JSON,
+        etag=None,
+        last_modified=None,
+        source_url="https://api.hut.test/old-endpoint",
+    )
+    mocker.patch.object(site_fetcher.http_client, "get", return_value=response)
+
+    body, _ = site_fetcher._fetch_api_payload(_api_site())
+
+    assert body == MENU_JSON
+    assert browser.capture.call_count == 1
+    # The endpoint the browser used replaces the broken one
+    entry = response_cache.load("https://hut.test/menu")
+    assert entry["source_url"] == "https://api.hut.test/menu/TAKEAWAY/1"
+
+
+def test_json_only_site_without_endpoint_fails(mocker, cache_dir, browser):
+    mocker.patch.object(
+        site_fetcher.http_client, "get", return_value=_http_response(500, "oops")
+    )
+    site = _api_site(needs_playwright=False, json_url="https://api.hut.test/m.json")
+
+    with pytest.raises(RuntimeError, match="No usable JSON endpoint"):
+        site_fetcher._fetch_api_payload(site)
+    browser.capture.assert_not_called()
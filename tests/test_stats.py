@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+from scraper.comparator import TypeAverages, get_product_changes, get_type_averages
+from scraper.stats import PriceStats
+
+
+def test_price_stats_summaries():
+    stats = PriceStats([2400, 2800, 2800, 3100, 3500])
+
+    assert (stats.count, stats.lowest, stats.highest) == (5, 2400, 3500)
+    assert stats.average == 2920
+    assert stats.quantile(0.5) == 2800
+    assert stats.quantile(0.9) == 3500
+
+
+def test_empty_price_stats():
+    stats = PriceStats()
+
+    assert stats.average is None
+    assert stats.quantile(0.5) is None
+    assert stats.lowest is None
+
+
+def test_remove_undoes_add():
+    stats = PriceStats([2400, 2800])
+    stats.add(3100)
+    stats.remove(3100)
+
+    assert stats.to_dict() == PriceStats([2400, 2800]).to_dict()
+    assert (stats.count, stats.total) == (2, 5200)
+
+
+def test_removing_an_uncounted_price_fails():
+    with pytest.raises(ValueError):
+        PriceStats([2400]).remove(2800)
+
+
+def test_merge_equals_stats_of_all_prices():
+    left, right = [2400, 2800, 2800], [2800, 3100]
+
+    merged = PriceStats(left).merge(PriceStats(right))
+
+    assert merged.to_dict() == PriceStats(left + right).to_dict()
+    assert (merged.count, merged.total) == (5, sum(left + right))
+
+
+def test_dict_round_trip():
+    stats = PriceStats([2400, 2800, 2800])
+
+    restored = PriceStats.from_dict(stats.to_dict())
+
+    assert restored.to_dict() == stats.to_dict()
+    assert (restored.count, restored.total) == (stats.count, stats.total)
+
+
+def test_type_averages_merge_of_per_site_partials(make_record):
+    etna = [
+        make_record("Margherita", 2400),
+        make_record("Carbonara", 2690, type_="pasta"),
+    ]
+    bellozzo = [make_record("Diavola", 3590, restaurant="Bellozzo")]
+
+    merged = TypeAverages()
+    for site in (etna, bellozzo):
+        partial = TypeAverages()
+        partial.add(site)
+        merged.merge(partial)
+
+    assert merged.rows() == get_type_averages(etna + bellozzo)
+
+
+def test_type_averages_dict_round_trip(make_record):
+    averages = TypeAverages()
+    averages.add([make_record("Margherita", 2400), make_record("Diavola", 3590)])
+
+    assert TypeAverages.from_dict(averages.to_dict()).rows() == averages.rows()
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_apply_changes_matches_a_rebuild(seed, make_record):
+    rng = random.Random(seed)
+    prices = [2400, 2800, 3100]
+    names = [f"Pizza {i}" for i in range(8)]
+
+    yesterday = [make_record(n, rng.choice(prices)) for n in rng.sample(names, 5)]
+    today = [make_record(n, rng.choice(prices)) for n in rng.sample(names, 5)]
+
+    averages = TypeAverages()
+    averages.add(yesterday)
+    averages.apply_changes(get_product_changes(today, yesterday))
+
+    assert averages.rows() == get_type_averages(today)
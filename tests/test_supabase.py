@@ -0,0 +1,124 @@
+import gzip
+import json
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from scraper.storage import supabase
+
+
+class _PostgREST(BaseHTTPRequestHandler):
+    """Stand-in for PostgREST: records upserts, fails the first N with 503."""
+
+    failures = 0
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if _PostgREST.failures:
+            _PostgREST.failures -= 1
+            self.send_response(503)
+        else:
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            _PostgREST.received.append(
+                (self.path, dict(self.headers), json.loads(body))
+            )
+            self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    httpd = HTTPServer(("127.0.0.1", 0), _PostgREST)
+    threading.Thread(
+        target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    ).start()
+    _PostgREST.failures = 0
+    _PostgREST.received = []
+
+    monkeypatch.setenv("SUPABASE_REST_URL", f"http://127.0.0.1:{httpd.server_port}/")
+    monkeypatch.delenv("SUPABASE_KEY", raising=False)
+    monkeypatch.setattr(supabase, "BACKOFF_FACTOR", 0)
+    supabase._config.cache_clear()
+    supabase._init_session.cache_clear()
+    yield _PostgREST
+    httpd.shutdown()
+    supabase._config.cache_clear()
+    supabase._init_session.cache_clear()
+
+
+def _items(n):
+    return [
+        {"product_name": f"Pizza {i}", "price": 2400 + i, "description": "x"}
+        for i in range(n)
+    ]
+
+
+def test_import_needs_no_credentials(monkeypatch):
+    monkeypatch.delenv("SUPABASE_URL", raising=False)
+    monkeypatch.delenv("SUPABASE_REST_URL", raising=False)
+    monkeypatch.delenv("SUPABASE_KEY", raising=False)
+    monkeypatch.setattr(supabase, "load_dotenv", lambda: None)
+    supabase._config.cache_clear()
+
+    with pytest.raises(RuntimeError):
+        supabase._config()
+    supabase._config.cache_clear()
+
+
+def test_upserts_in_chunks_on_the_conflict_key(server, monkeypatch):
+    monkeypatch.setattr(supabase, "CHUNK_ROWS", 2)
+
+    sent = supabase.upsert_products(_items(5), "Etna", "pizza", date(2026, 3, 1))
+
+    assert sent == 5
+    assert [len(rows) for _, _, rows in server.received] == [2, 2, 1]
+    path, headers, rows = server.received[0]
+    assert "on_conflict=restaurant%2Cproduct_type%2Cproduct_name%2Cfetched_at" in path
+    assert "resolution=merge-duplicates" in headers["Prefer"]
+    assert {r["fetched_at"] for _, _, chunk in server.received for r in chunk} == {
+        "2026-03-01"
+    }
+
+
+def test_repeated_names_keep_their_last_row(server):
+    items = _items(2) + [{"product_name": "Pizza 0", "price": 9999, "description": "y"}]
+
+    assert supabase.upsert_products(items, "Etna", "pizza") == 2
+    rows = server.received[0][2]
+    assert [(r["product_name"], r["price"]) for r in rows] == [
+        ("Pizza 0", 9999),
+        ("Pizza 1", 2401),
+    ]
+
+
+def test_retries_server_errors(server):
+    server.failures = 2
+
+    supabase.upsert_products(_items(1), "Etna", "pizza")
+
+    assert len(server.received) == 1
+
+
+def test_gzip_bodies(server, monkeypatch):
+    monkeypatch.setattr(supabase, "GZIP_BODIES", True)
+
+    supabase.upsert_products(_items(3), "Etna", "pizza")
+
+    assert server.received[0][1]["Content-Encoding"] == "gzip"
+    assert len(server.received[0][2]) == 3
+
+
+def test_session_retries_upserts(server):
+    retry = supabase._init_session().get_adapter("http://127.0.0.1").max_retries
+
+    assert retry.allowed_methods == frozenset({"GET", "POST"})
+    assert retry.total == supabase.MAX_RETRIES
+    assert retry.backoff_jitter == 0